@@ -2,28 +2,288 @@
 # Imports
 #----------------------------------------------------------------------------#
 import os
+import base64
+from datetime import date
 from flask import (
     Flask,
     request,
     jsonify,
+    json,
     abort,
     redirect,
     url_for,
-    render_template
+    stream_with_context,
+    current_app
 )
-from models import setup_db, Book, Degree
+from models import (
+    db,
+    setup_db,
+    Book,
+    Degree,
+    values_from_json,
+    normalize_isbn,
+    chunks,
+    ids_by,
+    taken_column,
+    insert_many,
+    update_many,
+    delete_many,
+    update_returning,
+    delete_one
+)
+from serializers import book_serializer, degree_serializer
+from json_provider import configure_json
+from instrumentation import init_metrics
 from flask_cors import CORS
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+
+from auth import AuthError, requires_auth, token_cache, jwks_store
+from cache import conditional
+from replica import init_replica, replica_read
+from assets import init_assets
+from pages import init_pages, serve_page
+from compression import init_compression
+from search import search
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+MAX_PAGE_SIZE = 100
+# years GET /data/books?year= accepts
+MIN_YEAR, MAX_YEAR = 1, 9998
+
+'''
+encode_cursor(date_read, id) / decode_cursor(cursor)
+    opaque keyset pagination cursor pointing right after the book (date_read, id)
+    decode_cursor raises ValueError on a malformed cursor
+'''
+def encode_cursor(date_read, id):
+    raw = f'{date_read.isoformat()}|{id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    date_read, id = raw.split('|')
+    return date.fromisoformat(date_read), int(id)
+
+
+STREAM_BATCH = 1000
+STREAM_CHUNK_BYTES = 64 * 1024
+
+'''
+read_format()
+    the format query parameter, json (the default) or ndjson
+'''
+def read_format():
+    format = request.args.get('format', 'json')
+    if format not in ('json', 'ndjson'):
+        abort(400)
+    return format
+
+'''
+stream_ndjson(query, serialize)
+    streams one json object per line for each row of query
+    rows are fetched STREAM_BATCH at a time through a server-side cursor and
+    written out in chunks of about STREAM_CHUNK_BYTES, so memory stays flat
+    whatever the size of the table
+'''
+def stream_ndjson(query, serialize):
+    def generate():
+        lines, size = [], 0
+        for row in query.yield_per(STREAM_BATCH):
+            line = json.dumps(serialize(row)) + '\n'
+            lines.append(line)
+            size += len(line)
+            if size >= STREAM_CHUNK_BYTES:
+                yield ''.join(lines)
+                lines, size = [], 0
+        yield ''.join(lines)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+MAX_BATCH_SIZE = 1000
+
+'''
+read_batch(key)
+    items of a batch request, sent either as a json array or as {key: [...]},
+    and whether the batch is atomic (the default) or partial (?mode=partial)
+    an atomic batch is written entirely or not at all, a partial one writes
+    every valid item and reports the others
+'''
+def read_batch(key):
+    mode = request.args.get('mode', 'atomic')
+    if mode not in ('atomic', 'partial'):
+        abort(400)
+    body = request.get_json(silent=True)
+    items = body.get(key) if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items or len(items) > MAX_BATCH_SIZE:
+        abort(422)
+    return items, mode == 'atomic'
+
+'''
+batch_result(key, records, errors, atomic)
+    json response of a batch request, errors maps the position of each
+    rejected item to the reason. An atomic batch with errors wrote nothing
+    and gets a 422
+'''
+def batch_result(key, records, errors, atomic):
+    errors = [{"index": index, "message": message} for index, message in sorted(errors.items())]
+    if errors and atomic:
+        return jsonify({
+            "success": False,
+            "error": 422,
+            "message": "unprocessable entity",
+            "errors": errors
+        }), 422
+    return jsonify({
+        "success": True,
+        key: records,
+        "errors": errors
+    })
+
+'''
+claim_unique(model, rows, indexes, errors)
+    the columns of model.unique are unique: rejects, in errors, the rows with
+    a value of one of them that belongs to another row of the table or was
+    already claimed earlier in the batch
+    returns the remaining rows and their indexes
+'''
+def claim_unique(model, rows, indexes, errors):
+    owners = {column: ids_by(model, getattr(model, column),
+                             [row[column] for row in rows if row.get(column) is not None])
+              for column in model.unique}
+    kept_rows, kept_indexes = [], []
+    for row, index in zip(rows, indexes):
+        taken = [column for column in model.unique if row.get(column) is not None
+                 and owners[column].get(row[column], row.get('id')) != row.get('id')]
+        if taken:
+            errors[index] = f'{taken[0]} already exists'
+            continue
+        for column in model.unique:
+            if row.get(column) is not None:
+                owners[column][row[column]] = row.get('id', -1)
+        kept_rows.append(row)
+        kept_indexes.append(index)
+    return kept_rows, kept_indexes
+
+'''
+records_by(model, column, values)
+    long() form of the rows whose column holds one of values
+'''
+def records_by(model, column, values):
+    records = []
+    for chunk in chunks(values):
+        records.extend(model.query.filter(column.in_(chunk)).order_by(model.id))
+    return [record.long() for record in records]
+
+'''
+create_batch(model, key) / update_batch(model, key) / delete_batch(model, key)
+    validate every item of a batch request first, then write the valid ones
+    in a single transaction with one executemany per statement
+'''
+def create_batch(model, key):
+    items, atomic = read_batch(key)
+    rows, indexes, errors = [], [], {}
+    for index, item in enumerate(items):
+        try:
+            rows.append(values_from_json(item, model.properties, derived=model.derived))
+            indexes.append(index)
+        except ValueError as e:
+            errors[index] = str(e)
+    rows, indexes = claim_unique(model, rows, indexes, errors)
+    if errors and atomic:
+        return batch_result(key, [], errors, atomic)
+
+    try:
+        errors.update(insert_many(model, rows, indexes, atomic))
+    except IntegrityError:
+        abort(422)
+    written = [row['title'] for row, index in zip(rows, indexes) if index not in errors]
+    return batch_result(key, records_by(model, model.title, written), errors, atomic)
+
+def update_batch(model, key):
+    items, atomic = read_batch(key)
+    rows, indexes, errors = [], [], {}
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('expected a json object')
+            item = dict(item)
+            id = item.pop('id', None)
+            if not isinstance(id, int) or isinstance(id, bool):
+                raise ValueError('id must be an integer')
+            row = values_from_json(item, model.properties, partial=True, derived=model.derived)
+            row['id'] = id
+            rows.append(row)
+            indexes.append(index)
+        except ValueError as e:
+            errors[index] = str(e)
+
+    found = ids_by(model, model.id, [row['id'] for row in rows])
+    seen = set()
+    for row, index in zip(rows, indexes):
+        if row['id'] not in found:
+            errors[index] = 'not found'
+        elif row['id'] in seen:
+            errors[index] = 'id appears more than once'
+        seen.add(row['id'])
+    kept = [(row, index) for row, index in zip(rows, indexes) if index not in errors]
+    rows, indexes = [row for row, _ in kept], [index for _, index in kept]
+    rows, indexes = claim_unique(model, rows, indexes, errors)
+    if errors and atomic:
+        return batch_result(key, [], errors, atomic)
+
+    try:
+        errors.update(update_many(model, rows, indexes, atomic))
+    except IntegrityError:
+        abort(422)
+    written = [row['id'] for row, index in zip(rows, indexes) if index not in errors]
+    return batch_result(key, records_by(model, model.id, written), errors, atomic)
+
+def delete_batch(model, key):
+    ids, atomic = read_batch(key)
+    errors = {}
+    for index, id in enumerate(ids):
+        if not isinstance(id, int) or isinstance(id, bool):
+            errors[index] = 'id must be an integer'
+    found = ids_by(model, model.id, [id for index, id in enumerate(ids) if index not in errors])
+    for index, id in enumerate(ids):
+        if index not in errors and id not in found:
+            errors[index] = 'not found'
+    if errors and atomic:
+        return batch_result(key, [], errors, atomic)
+
+    deleted = sorted(set(id for index, id in enumerate(ids) if index not in errors))
+    delete_many(model, deleted)
+    return batch_result(key, deleted, errors, atomic)
 
-from auth import AuthError, requires_auth
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-def create_app(test_config=None):
+def create_app(test_config=None, json_encoder=None):
     # create and configure the app
     app = Flask(__name__, template_folder="../frontend/templates", static_folder='../frontend/resources')
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    if test_config:
+        app.config.update(test_config)
+    # orjson backed by default, see json_provider.py
+    configure_json(app, json_encoder)
     CORS(app)
+    # opt-in timing: Server-Timing headers and GET /metrics, see instrumentation.py
+    if app.config['METRICS_ENABLED']:
+        init_metrics(app)
+    # public reads from DATABASE_URL_READ when set, see replica.py
+    init_replica(app)
+    # fingerprinted images and the picture() template helper, see assets.py
+    init_assets(app)
+    # /, /degrees and /projects served from memory, see pages.py
+    init_pages(app)
+    # gzip / brotli / zstd for the API, see compression.py
+    init_compression(app)
 
     # HAVE NOT TESTED YET
     @app.before_request
@@ -46,17 +306,24 @@ def create_app(test_config=None):
     ###########################  ROUTES  ############################
     ## Static
 
+    # rendered and compressed once by init_pages, or once per write to the
+    # table behind them for /degrees and /reading, see pages.py
+
     @app.route('/')
     def index():
-        return render_template('index.html')
+        return serve_page('index')
     
     @app.route('/degrees')
     def degrees():
-        return render_template('degrees.html')
+        return serve_page('degrees')
     
     @app.route('/projects')
     def projects():
-        return render_template('projects.html')
+        return serve_page('projects')
+
+    @app.route('/reading')
+    def reading():
+        return serve_page('reading')
 
 
     #############  BOOKS  ##############
@@ -68,18 +335,122 @@ def create_app(test_config=None):
     '''
         GET /data/books
             public endpoint
+                year      only books read that year, from 1 to 9998
+                year      only books read that year
+                author    only books by that author
+                fields    comma separated subset of the book properties to return
+                limit     page size, at most MAX_PAGE_SIZE; without it every book is returned
+                cursor    the next_cursor of the previous page
+                format    ndjson streams one book object per line instead, with the same filters
         returns status code 200 and json {"success": True, "total_books": total_books,
-        "books": books } where books is a list of book objects,
+        "books": books } where books is a list of book objects ordered by date read and
+        total_books counts every book matching the filters. When limit is given the json
+        also holds "next_cursor", null on the last page,
             or appropriate status code indicating reason for failure
+        responses carry an ETag, a matching If-None-Match gets a 304 for one version lookup, no data query
     '''
     @app.route("/data/books", methods=["GET"])
+    @conditional("books")
+    @replica_read("books")
     def retrieve_books():
-        books = Book.query.order_by(Book.date_read).all()
-        books = [book.long() for book in books]
+        args = request.args
+        try:
+            year = int(args['year']) if 'year' in args else None
+            limit = int(args['limit']) if 'limit' in args else None
+            cursor = decode_cursor(args['cursor']) if 'cursor' in args else None
+            fields = args['fields'].split(',') if 'fields' in args else Book.long_fields
+        except ValueError:
+            abort(400)
+        author = args.get('author')
+        format = read_format()
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            abort(400)
+        # the year filter spans [year-01-01, year+1-01-01), both must be dates
+        if year is not None and not MIN_YEAR <= year <= MAX_YEAR:
+            abort(400)
+        if any(field not in Book.long_fields for field in fields):
+            abort(400)
+
+        # id and date_read are always selected, the cursor is built from them
+        serializer = book_serializer(fields, extra=('id', 'date_read'))
+        query = Book.filtered(serializer.query(Book.query), year, author)
+        if cursor is not None:
+            query = query.filter(tuple_(Book.date_read, Book.id) > cursor)
+        query = query.order_by(Book.date_read, Book.id)
+        if format == 'ndjson':
+            if limit is not None:
+                query = query.limit(limit)
+            return stream_ndjson(query, serializer.one)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.all()
+
+        response = {
+            "success": True,
+            "total_books": Book.count(year, author),
+        }
+        if limit is not None:
+            last = rows[limit - 1] if len(rows) > limit else None
+            rows = rows[:limit]
+            response["next_cursor"] = encode_cursor(last.date_read, last.id) if last else None
+        response["books"] = serializer.many(rows)
+        return jsonify(response)
+
+
+    '''
+        GET /data/books/stats
+            public endpoint
+            optional query parameter
+                top       number of top authors to return, 1 to MAX_PAGE_SIZE, default 10
+        returns status code 200 and json {"success": True, "stats": stats } where
+        stats holds total_books, total_authors, first_read, last_read, books_per_month,
+        per_year, a list of {"year", "books", "authors"}, and top_authors, a list of
+        {"author", "books"}, all computed by the database
+            or appropriate status code indicating reason for failure
+        responses carry an ETag, a matching If-None-Match gets a 304 for one version lookup, no data query
+    '''
+    @app.route("/data/books/stats", methods=["GET"])
+    @conditional("books")
+    @replica_read("books")
+    def retrieve_book_stats():
+        try:
+            top = int(request.args.get('top', 10))
+        except ValueError:
+            abort(400)
+        if not 1 <= top <= MAX_PAGE_SIZE:
+            abort(400)
+        return jsonify({
+            "success": True,
+            "stats": Book.stats(top)
+        })
+
+
+    '''
+        GET /data/books/isbn/isbn
+            public endpoint
+            isbn is an ISBN-13 or ISBN-10, with or without dashes, matched on the
+            normalized isbn13 column; anything else is matched as stored
+        returns status code 200 and json {"success": True, "books": book } where
+        books is an array containing only the matched book object,
+            or status code 404 if no book has that isbn
+        responses carry an ETag, a matching If-None-Match gets a 304 for one version lookup, no data query
+    '''
+    @app.route("/data/books/isbn/<isbn>", methods=["GET"])
+    @conditional("books")
+    @replica_read("books")
+    def retrieve_book_by_isbn(isbn):
+        serializer = book_serializer()
+        normalized = normalize_isbn(isbn)
+        if normalized is not None:
+            condition = Book.isbn13 == normalized
+        else:
+            condition = Book.isbn == isbn
+        book = serializer.query(Book.query).filter(condition).order_by(Book.id).first()
+        if book is None:
+            abort(404)
         return jsonify({
             "success": True,
-            "total_books": len(books),
-            "books": books
+            "books": [serializer.one(book)]
         })
 
 
@@ -89,17 +460,19 @@ def create_app(test_config=None):
         returns status code 200 and json {"success": True, "books": book } where 
         books is an array containing only the matched book object,
             or appropriate status code indicating reason for failure
+        responses carry an ETag, a matching If-None-Match gets a 304 for one version lookup, no data query
     '''
     @app.route("/data/books/<int:id>", methods=["GET"])
+    @conditional("books")
+    @replica_read("books")
     def retrieve_book(id):
-        book = Book.query.get(id)
-        if book:
-            book = book.long()
-        else:
+        serializer = book_serializer()
+        book = serializer.query(Book.query).filter(Book.id == id).first()
+        if book is None:
             abort(404)
         return jsonify({
             "success": True,
-            "books": [book]
+            "books": [serializer.one(book)]
         })
 
         
@@ -108,20 +481,21 @@ def create_app(test_config=None):
             requires the 'post:books' permission
         returns status code 200 and json {"success": True, "books": book} where 
         book is an array containing only the newly created book,
+            or status code 409 if a book with the same title or isbn exists,
             or appropriate status code indicating reason for failure
     '''
     @app.route("/data/books", methods=["POST"])
     @requires_auth("post:books")
     def create_book(payload):
         try:
-            body = request.get_json()
-            new_book = Book(
-                isbn=body["isbn"],
-                title=body["title"],
-                author=body["author"],
-                year_published=body["year_published"],
-                date_read=body["date_read"]
-                )
+            values = values_from_json(request.get_json(), Book.properties, derived=Book.derived)
+        except Exception:
+            abort(422)
+        taken = taken_column(Book, values)
+        if taken is not None:
+            abort(409, f'a book with this {taken} already exists')
+        try:
+            new_book = Book(**values)
             new_book.insert()
 
             return jsonify({
@@ -139,30 +513,31 @@ def create_app(test_config=None):
             requires the 'patch:books' permission
         returns status code 200 and json {"success": True, "books": book} where 
         book is an array containing only the updated book,
+            or status code 409 if the new title or isbn belongs to another book,
             or appropriate status code indicating reason for failure
     '''
     @app.route("/data/books/<int:id>", methods=["PATCH"])
     @requires_auth("patch:books")
     def update_book(payload, id):
         try:
-            book = Book.query.get(id)
-            data = request.get_json()
-            data_keys = list(data.keys())
-            book_properties = ["isbn", "title", "author", "year_published", "date_read"]
-            if len([k for k in data_keys if k not in book_properties]) > 0:
-                raise Exception
-            else:
-                for key, value in data.items():
-                    if value:
-                        setattr(book, key, value)
-
-            book.update()
-            return jsonify({
-                "success": True,
-                "books": [book.long()]
-            })
+            data = values_from_json(request.get_json(), Book.properties, partial=True, derived=Book.derived)
         except Exception:
             abort(422)
+        serializer = book_serializer()
+        try:
+            book = update_returning(Book, id, data, serializer.columns)
+        except IntegrityError:
+            # the unique indexes on title and isbn13 refused it, name the column
+            taken = taken_column(Book, data, id) or 'title or isbn'
+            abort(409, f'a book with this {taken} already exists')
+        except Exception:
+            abort(422)
+        if book is None:
+            abort(404)
+        return jsonify({
+            "success": True,
+            "books": [serializer.one(book)]
+        })
 
 
     '''
@@ -176,17 +551,58 @@ def create_app(test_config=None):
     @app.route("/data/books/<int:id>", methods=["DELETE"])
     @requires_auth("delete:books")
     def delete_book(payload, id):
-        try:
-            book = Book.query.get(id)
-            book.delete()
-
-            return jsonify({
-                "success": True,
-                "id_deleted": id
-            })
-        except Exception:
+        if not delete_one(Book, id):
             abort(404)
-        
+        return jsonify({
+            "success": True,
+            "id_deleted": id
+        })
+
+
+    '''
+        POST /data/books/batch
+            requires the 'post:books' permission
+            body: a json array of book objects, or {"books": [...]}, at most MAX_BATCH_SIZE
+            ?mode=atomic (default) writes every book or none, ?mode=partial writes the valid ones
+        returns status code 200 and json {"success": True, "books": books, "errors": errors} where
+        books are the created books and errors lists {"index", "message"} of each rejected item,
+            or status code 422 and the errors when an atomic batch is rejected
+    '''
+    @app.route("/data/books/batch", methods=["POST"])
+    @requires_auth("post:books")
+    def create_books_batch(payload):
+        return create_batch(Book, "books")
+
+
+    '''
+        PATCH /data/books/batch
+            requires the 'patch:books' permission
+            body: a json array of partial book objects including their "id", or {"books": [...]}
+            ?mode=atomic (default) or ?mode=partial as for POST
+        returns status code 200 and json {"success": True, "books": books, "errors": errors} where
+        books are the updated books,
+            or status code 422 and the errors when an atomic batch is rejected
+    '''
+    @app.route("/data/books/batch", methods=["PATCH"])
+    @requires_auth("patch:books")
+    def update_books_batch(payload):
+        return update_batch(Book, "books")
+
+
+    '''
+        DELETE /data/books/batch
+            requires the 'delete:books' permission
+            body: a json array of ids, or {"books": [...]}
+            ?mode=atomic (default) or ?mode=partial as for POST
+        returns status code 200 and json {"success": True, "books": ids, "errors": errors} where
+        ids are the ids deleted,
+            or status code 422 and the errors when an atomic batch is rejected
+    '''
+    @app.route("/data/books/batch", methods=["DELETE"])
+    @requires_auth("delete:books")
+    def delete_books_batch(payload):
+        return delete_batch(Book, "books")
+
 
 
     #############  DEGREES  ##############
@@ -194,15 +610,22 @@ def create_app(test_config=None):
     '''
         GET /data/degrees
             public endpoint
+            ?format=ndjson streams one degree object per line instead
         returns status code 200 and json {"success": True, "total_degrees": total_degrees,
         "degrees": degrees } where degrees is a list of degree objects,
             or appropriate status code indicating reason for failure
+        responses carry an ETag, a matching If-None-Match gets a 304 for one version lookup, no data query
     '''
     @app.route("/data/degrees", methods=["GET"])
+    @conditional("degrees")
+    @replica_read("degrees")
     def retrieve_degrees():
+        serializer = degree_serializer()
+        query = serializer.query(Degree.query).order_by(Degree.year_completed, Degree.id)
+        if read_format() == 'ndjson':
+            return stream_ndjson(query, serializer.one)
         try:
-            degrees = Degree.query.order_by(Degree.year_completed).all()
-            degrees = [degree.long() for degree in degrees]
+            degrees = serializer.many(query.all())
             return jsonify({
                 "success": True,
                 "total_degrees": len(degrees),
@@ -218,17 +641,19 @@ def create_app(test_config=None):
         returns status code 200 and json {"success": True, "degrees": degree } where 
         degrees is an array containing only the matched degree object,
             or appropriate status code indicating reason for failure
+        responses carry an ETag, a matching If-None-Match gets a 304 for one version lookup, no data query
     '''
     @app.route("/data/degrees/<int:id>", methods=["GET"])
+    @conditional("degrees")
+    @replica_read("degrees")
     def retrieve_degree(id):
-        degree = Degree.query.get(id)
-        if degree:
-            degree = degree.long()
-        else:
+        serializer = degree_serializer()
+        degree = serializer.query(Degree.query).filter(Degree.id == id).first()
+        if degree is None:
             abort(404)
         return jsonify({
             "success": True,
-            "degrees": [degree]
+            "degrees": [serializer.one(degree)]
         })
 
         
@@ -243,16 +668,7 @@ def create_app(test_config=None):
     @requires_auth("post:degrees")
     def create_degree(payload):
         try:
-            body = request.get_json()
-            new_degree = Degree(
-                institution=body["institution"],
-                title=body["title"],
-                category=body["category"],
-                year_completed=body["year_completed"],
-                location=body["location"],
-                url=body['url']
-                )
-
+            new_degree = Degree(**values_from_json(request.get_json(), Degree.properties, derived=Degree.derived))
             new_degree.insert()
 
             return jsonify({
@@ -276,24 +692,20 @@ def create_app(test_config=None):
     @requires_auth("patch:degrees")
     def update_degree(payload, id):
         try:
-            degree = Degree.query.get(id)
-            data = request.get_json()
-            data_keys = list(data.keys())
-            degree_properties = ["institution", "title", "category", "year_completed", "url", "location"]
-            if len([k for k in data_keys if k not in degree_properties]) > 0:
-                raise Exception
-            else:
-                for key, value in data.items():
-                    if value:
-                        setattr(degree, key, value)
-
-            degree.update()
-            return jsonify({
-                "success": True,
-                "degrees": [degree.long()]
-            })
+            data = values_from_json(request.get_json(), Degree.properties, partial=True, derived=Degree.derived)
         except Exception:
             abort(422)
+        serializer = degree_serializer()
+        try:
+            degree = update_returning(Degree, id, data, serializer.columns)
+        except Exception:
+            abort(422)
+        if degree is None:
+            abort(404)
+        return jsonify({
+            "success": True,
+            "degrees": [serializer.one(degree)]
+        })
 
 
     '''
@@ -307,16 +719,129 @@ def create_app(test_config=None):
     @app.route("/data/degrees/<int:id>", methods=["DELETE"])
     @requires_auth("delete:degrees")
     def delete_degree(payload, id):
+        if not delete_one(Degree, id):
+            abort(404)
+        return jsonify({
+            "success": True,
+            "id_deleted": id
+        })
+
+
+    '''
+        POST /data/degrees/batch
+            requires the 'post:degrees' permission
+            body: a json array of degree objects, or {"degrees": [...]}, at most MAX_BATCH_SIZE
+            ?mode=atomic (default) writes every degree or none, ?mode=partial writes the valid ones
+        returns status code 200 and json {"success": True, "degrees": degrees, "errors": errors} where
+        degrees are the created degrees and errors lists {"index", "message"} of each rejected item,
+            or status code 422 and the errors when an atomic batch is rejected
+    '''
+    @app.route("/data/degrees/batch", methods=["POST"])
+    @requires_auth("post:degrees")
+    def create_degrees_batch(payload):
+        return create_batch(Degree, "degrees")
+
+
+    '''
+        PATCH /data/degrees/batch
+            requires the 'patch:degrees' permission
+            body: a json array of partial degree objects including their "id", or {"degrees": [...]}
+            ?mode=atomic (default) or ?mode=partial as for POST
+        returns status code 200 and json {"success": True, "degrees": degrees, "errors": errors} where
+        degrees are the updated degrees,
+            or status code 422 and the errors when an atomic batch is rejected
+    '''
+    @app.route("/data/degrees/batch", methods=["PATCH"])
+    @requires_auth("patch:degrees")
+    def update_degrees_batch(payload):
+        return update_batch(Degree, "degrees")
+
+
+    '''
+        DELETE /data/degrees/batch
+            requires the 'delete:degrees' permission
+            body: a json array of ids, or {"degrees": [...]}
+            ?mode=atomic (default) or ?mode=partial as for POST
+        returns status code 200 and json {"success": True, "degrees": ids, "errors": errors} where
+        ids are the ids deleted,
+            or status code 422 and the errors when an atomic batch is rejected
+    '''
+    @app.route("/data/degrees/batch", methods=["DELETE"])
+    @requires_auth("delete:degrees")
+    def delete_degrees_batch(payload):
+        return delete_batch(Degree, "degrees")
+
+
+
+    ###########################  SEARCH  ############################
+
+    '''
+        GET /data/search
+            public endpoint
+            query parameters
+                q         words to look for, each matching as a prefix, e.g. 'harp lee'
+                type      optional, books or degrees to search only one of them
+                limit     results per type, at most MAX_PAGE_SIZE, default 10
+        returns status code 200 and json {"success": True, "books": books, "degrees": degrees }
+        where books and degrees are lists of book and degree objects, best match first,
+        words in titles ranking above words in authors / institutions and isbns
+            or status code 400 if q is missing or a parameter is invalid
+        responses carry an ETag, a matching If-None-Match gets a 304 for one version lookup, no data query
+    '''
+    @app.route("/data/search", methods=["GET"])
+    @conditional("books", "degrees")
+    @replica_read("books", "degrees")
+    def search_data():
+        q = request.args.get('q', '').strip()
+        types = request.args.get('type')
         try:
-            degree = Degree.query.get(id)
-            degree.delete()
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            abort(400)
+        if not q or not 1 <= limit <= MAX_PAGE_SIZE or types not in (None, 'books', 'degrees'):
+            abort(400)
 
-            return jsonify({
-                "success": True,
-                "id_deleted": id
-            })
-        except Exception:
-            abort(404)
+        response = {"success": True}
+        for table, model, serializer in (("books", Book, book_serializer()),
+                                         ("degrees", Degree, degree_serializer())):
+            if types in (None, table):
+                ids = search(table, q, limit)
+                rows = {row.id: row for row in serializer.query(model.query).filter(model.id.in_(ids))} if ids else {}
+                response[table] = serializer.many(rows[id] for id in ids if id in rows)
+        return jsonify(response)
+
+
+
+    ###########################  STATUS  ############################
+
+    '''
+        GET /status/auth
+            public endpoint
+        returns status code 200 and json {"success": True, "token_cache": stats,
+        "jwks": stats } with the hit/miss counters of the verified-token cache
+        and the fetch counters of the JWKS cache for this worker
+    '''
+    @app.route("/status/auth", methods=["GET"])
+    def auth_status():
+        return jsonify({
+            "success": True,
+            "token_cache": token_cache.stats(),
+            "jwks": jwks_store.stats()
+        })
+
+    '''
+        GET /status/db-pool
+            public endpoint
+        returns status code 200 and json {"success": True, "db_pool": stats} with
+        the pool class, its size, checked in/out and overflow connections, and how
+        many connections this worker opened against how many checkouts it served
+    '''
+    @app.route("/status/db-pool", methods=["GET"])
+    def db_pool_status():
+        return jsonify({
+            "success": True,
+            "db_pool": db.engine.pool_stats.stats()
+        })
 
 
 
@@ -359,6 +884,18 @@ def create_app(test_config=None):
         }), 405
 
 
+    '''
+        409 conflict, the message says with what
+    '''
+    @app.errorhandler(409)
+    def conflict(error):
+        return jsonify({
+            "success": False,
+            "error": 409,
+            "message": error.description
+        }), 409
+
+
     '''
         422 unproecssable entity
     '''
@@ -385,4 +922,4 @@ def create_app(test_config=None):
     return app
 
 app = create_app()
-setup_db(app, os.environ.get('DATABASE_URL'))
+setup_db(app, os.environ.get('DATABASE_URL'), os.environ.get('DATABASE_URL_READ'))
@@ -0,0 +1,253 @@
+'''
+Fingerprinted frontend assets, with responsive image variants.
+
+    cd backend
+    python assets.py
+    python assets.py --widths 320,640,1280 --formats webp
+
+The build copies every file of frontend/resources to frontend/assets
+(ASSETS_DIR) under a name holding the hash of its content, e.g.
+favicon/techie2.3f9c0a1e.png. The PNG and JPEG images of images/ also get
+variants resized to each of --widths narrower than the original. Each
+variant comes in AVIF (when Pillow can encode it), WebP and the original
+format. manifest.json maps every source path to its files.
+
+init_assets(app) loads the manifest and serves the files at /assets/ for a
+year, as immutable: a file never changes under a given name, a new build
+gives a changed file a new one. Templates link to them through two Jinja
+globals:
+
+    {{ asset_url('favicon/techie2.png') }}
+    {{ picture('images/headshot.jpg', 'Headshot', width=500) }}
+
+picture() emits a <picture> with an AVIF and a WebP srcset, and an <img>
+with the srcset of the original format, so browsers download the smallest
+file that fills the displayed width. Without a build, both fall back to the
+untouched files under /resources.
+'''
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+
+from flask import url_for, send_from_directory
+from markupsafe import Markup, escape
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
+SOURCE_DIR = os.path.join(FRONTEND_DIR, 'resources')
+ASSETS_DIR = os.environ.get('ASSETS_DIR', os.path.join(FRONTEND_DIR, 'assets'))
+MANIFEST = 'manifest.json'
+
+WIDTHS = (320, 640, 960, 1280, 1920)
+FORMATS = ('avif', 'webp')
+RESIZABLE = ('.png', '.jpg', '.jpeg')
+
+# (Pillow format, file extension, save options)
+ENCODERS = {
+    'avif': ('AVIF', '.avif', {'quality': 60}),
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', '.jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', '.png', {'optimize': True}),
+}
+
+ONE_YEAR = 365 * 24 * 3600
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+def fingerprinted(path, data):
+    stem, ext = os.path.splitext(path)
+    return '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:8], ext)
+
+
+def write(output_dir, path, data):
+    name = fingerprinted(path, data)
+    target = os.path.join(output_dir, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if not os.path.exists(target):
+        with open(target, 'wb') as f:
+            f.write(data)
+    return name
+
+
+def encode(image, fmt):
+    pil_format, _, options = ENCODERS[fmt]
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+'''
+image_entry(path, data, output_dir, widths, formats)
+    writes the variants of the image data, from the source file path, and
+    returns its manifest entry:
+    {"url", "width", "height", "variants": {format: [[width, name], ...]}}
+'''
+def image_entry(path, data, output_dir, widths, formats):
+    from PIL import Image
+
+    original = Image.open(io.BytesIO(data))
+    original.load()
+    fallback = 'jpeg' if original.format == 'JPEG' else 'png'
+    stem = os.path.splitext(path)[0]
+    entry = {
+        'url': write(output_dir, path, data),
+        'width': original.width,
+        'height': original.height,
+        'variants': {}
+    }
+    sizes = sorted({w for w in widths if w < original.width} | {original.width})
+    for fmt in list(formats) + [fallback]:
+        variants = []
+        for width in sizes:
+            if width == original.width:
+                image = original
+            else:
+                height = round(original.height * width / original.width)
+                image = original.resize((width, height), Image.LANCZOS)
+            name = '%s-%dw%s' % (stem, width, ENCODERS[fmt][1])
+            variants.append([width, write(output_dir, name, encode(image, fmt))])
+        entry['variants'][fmt] = variants
+    return entry
+
+
+'''
+build(source_dir, output_dir, widths, formats)
+    fingerprints every file of source_dir into output_dir, with the image
+    variants of images/, and writes the manifest; returns it
+'''
+def build(source_dir=SOURCE_DIR, output_dir=ASSETS_DIR, widths=WIDTHS, formats=FORMATS):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError('building assets needs Pillow, pip install Pillow')
+    # Pillow registers a writer only for the formats it was built with,
+    # AVIF from Pillow 11.2 on
+    Image.init()
+    formats = [fmt for fmt in formats if ENCODERS[fmt][0] in Image.SAVE]
+
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    manifest = {}
+    for root, _, files in os.walk(source_dir):
+        for file in sorted(files):
+            path = os.path.relpath(os.path.join(root, file), source_dir).replace(os.sep, '/')
+            with open(os.path.join(root, file), 'rb') as f:
+                data = f.read()
+            if path.startswith('images/') and path.lower().endswith(RESIZABLE):
+                manifest[path] = image_entry(path, data, output_dir, widths, formats)
+            else:
+                manifest[path] = {'url': write(output_dir, path, data)}
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+#----------------------------------------------------------------------------#
+# Templates.
+#----------------------------------------------------------------------------#
+
+def load_manifest(assets_dir):
+    try:
+        with open(os.path.join(assets_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def srcset(variants):
+    return ', '.join('%s %dw' % (url_for('asset', filename=name), width) for width, name in variants)
+
+
+def attributes(**attrs):
+    return ' '.join('%s="%s"' % (name.replace('_', '-'), escape(value))
+                    for name, value in attrs.items() if value is not None)
+
+
+'''
+init_assets(app)
+    loads the manifest of ASSETS_DIR (app.config, or the environment), serves
+    /assets/<filename> as immutable and registers the asset_url and picture
+    template globals; call it before init_pages
+'''
+def init_assets(app):
+    assets_dir = app.config.setdefault('ASSETS_DIR', ASSETS_DIR)
+    manifest = load_manifest(assets_dir)
+    app.extensions['assets'] = manifest
+
+    @app.route('/assets/<path:filename>', endpoint='asset')
+    def serve_asset(filename):
+        response = send_from_directory(assets_dir, filename, cache_timeout=ONE_YEAR)
+        response.headers['Cache-Control'] = 'public, max-age=%d, immutable' % ONE_YEAR
+        return response
+
+    '''
+    asset_url(path)
+        url of the fingerprinted copy of frontend/resources/path
+    '''
+    def asset_url(path):
+        entry = manifest.get(path)
+        if entry is None:
+            return url_for('static', filename=path)
+        return url_for('asset', filename=entry['url'])
+
+    '''
+    picture(path, alt, width, height, sizes, loading, **attrs)
+        a responsive <picture> for an image of frontend/resources displayed
+        width pixels wide; sizes defaults to the full viewport width up to
+        that, extra keyword arguments become attributes of the <img>. Pass
+        loading='eager' for an image in the first screen
+    '''
+    def picture(path, alt, width, height=None, sizes=None, loading='lazy', **attrs):
+        entry = manifest.get(path)
+        if entry is None:
+            return Markup('<img %s>' % attributes(src=asset_url(path), width=width, height=height,
+                                                   alt=alt, **attrs))
+        if height is None:
+            height = round(entry['height'] * width / entry['width'])
+        sizes = sizes or '(max-width: %dpx) 100vw, %dpx' % (width, width)
+        variants = dict(entry['variants'])
+        fallback = variants.pop('jpeg', None) or variants.pop('png')
+        sources = ''.join('<source %s>' % attributes(type='image/' + fmt, srcset=srcset(variants[fmt]),
+                                                     sizes=sizes)
+                          for fmt in FORMATS if fmt in variants)
+        image = '<img %s>' % attributes(src=url_for('asset', filename=fallback[-1][1]),
+                                        srcset=srcset(fallback), sizes=sizes, width=width,
+                                        height=height, alt=alt, loading=loading, decoding='async',
+                                        **attrs)
+        return Markup('<picture>%s%s</picture>' % (sources, image))
+
+    app.jinja_env.globals.update(asset_url=asset_url, picture=picture)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=SOURCE_DIR)
+    parser.add_argument('--output', default=ASSETS_DIR)
+    parser.add_argument('--widths', default=','.join(map(str, WIDTHS)))
+    parser.add_argument('--formats', default=','.join(FORMATS),
+                        help='modern formats to add to the original one, those Pillow cannot write are skipped')
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.output, [int(w) for w in args.widths.split(',')],
+                     args.formats.split(','))
+    source_bytes = output_bytes = 0
+    for path, entry in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(args.source, path))
+        smallest = min((os.path.getsize(os.path.join(args.output, variants[-1][1]))
+                        for variants in entry.get('variants', {}).values()), default=size)
+        source_bytes += size
+        output_bytes += smallest
+        print('%-40s %9d -> %9d bytes at full width' % (path, size, smallest))
+    print('%-40s %9d -> %9d bytes' % ('total', source_bytes, output_bytes))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,33 @@
-import json
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from instrumentation import timed
+from jwks import JWKSKeyStore
 
 
 AUTH0_DOMAIN = 'dev-coffee-auth.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'life-data-api'
 
+'''
+Auth0 signing keys, cached in-process (see jwks.py)
+    AUTH0_JWKS_URL      where to fetch the key set from, file:// urls work for local testing
+    JWKS_CACHE_TTL      seconds a fetched key set is trusted, 0 fetches on every request
+    JWKS_SNAPSHOT_PATH  optional file holding the last-known-good key set
+'''
+jwks_store = JWKSKeyStore(
+    os.environ.get('AUTH0_JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'),
+    ttl=int(os.environ.get('JWKS_CACHE_TTL', 3600)),
+    min_refetch_interval=int(os.environ.get('JWKS_MIN_REFETCH_INTERVAL', 30)),
+    snapshot_path=os.environ.get('JWKS_SNAPSHOT_PATH')
+)
+
 ## AuthError Exception
 '''
 AuthError Exception
@@ -84,7 +103,7 @@ def check_permissions(permission, payload):
         token: a json web token (string)
 
     it should be an Auth0 token with key id (kid)
-    it should verify the token using Auth0 /.well-known/jwks.json
+    it should verify the token using Auth0 /.well-known/jwks.json, served from jwks_store
     it should decode the payload from the token
     it should validate the claims
     return the decoded payload
@@ -92,25 +111,14 @@ def check_permissions(permission, payload):
     !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
 '''
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = jwks_store.get_key(unverified_header['kid'])
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -144,13 +152,74 @@ def verify_decode_jwt(token):
                 'description': 'Unable to find the appropriate key.'
             }, 401)
 
+'''
+VerifiedTokenCache
+    bounded LRU of already verified tokens, keyed by a sha256 of the token
+    a hit skips the RS256 signature check and claims parsing, the permission
+    check still runs on every request
+    entries are dropped once the token's exp has passed
+'''
+class VerifiedTokenCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None:
+                payload, exp = entry
+                if exp > time.time():
+                    self._tokens.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._tokens[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        exp = payload.get('exp')
+        if not self.maxsize or not isinstance(exp, (int, float)):
+            return
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        with self._lock:
+            self._tokens[key] = (payload, exp)
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.maxsize:
+                self._tokens.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._tokens),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+'''
+TOKEN_CACHE_SIZE  number of verified tokens to remember, 0 disables the cache
+'''
+token_cache = VerifiedTokenCache(int(os.environ.get('TOKEN_CACHE_SIZE', 1024)))
+
+
 '''
 @TODO implement @requires_auth(permission) decorator method
     @INPUTS
         permission: string permission (i.e. 'post:drink')
 
     it should use the get_token_auth_header method to get the token
-    it should use the verify_decode_jwt method to decode the jwt
+    it should use the verify_decode_jwt method to decode the jwt, unless token_cache already verified it
     it should use the check_permissions method validate claims and check the requested permission
     return the decorator which passes the decoded payload to the decorated method
 '''
@@ -159,7 +228,11 @@ def requires_auth(permission=''):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
+            payload = token_cache.get(token)
+            if payload is None:
+                with timed('auth'):
+                    payload = verify_decode_jwt(token)
+                token_cache.put(token, payload)
             check_permissions(permission, payload)
             return f(payload, *args, **kwargs)
 
@@ -0,0 +1,145 @@
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import rsa
+from jose import jwt
+
+import auth
+from auth import ALGORITHMS, API_AUDIENCE, AUTH0_DOMAIN
+from jwks import JWKSKeyStore
+
+'''
+Local stand-ins for Auth0, used by tests and benchmarks.
+
+LocalSigner generates an RSA key pair, publishes it as a JWKS document and
+signs RS256 tokens with the issuer and audience that auth.py expects.
+LocalAuth0 points auth.py at a LocalSigner for the length of a test.
+serve_jwks() exposes a JWKS document over HTTP, optionally with an added
+delay to simulate a slow Auth0.
+'''
+
+
+def _b64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class LocalSigner:
+    def __init__(self, kid='local-test-key', bits=2048):
+        self.kid = kid
+        public_key, private_key = rsa.newkeys(bits)
+        self.public_key = public_key
+        self.private_pem = private_key.save_pkcs1().decode('ascii')
+
+    '''
+    jwks()
+        the JWKS document Auth0 would publish for this key pair
+    '''
+    def jwks(self):
+        return {
+            'keys': [{
+                'kty': 'RSA',
+                'kid': self.kid,
+                'use': 'sig',
+                'alg': ALGORITHMS[0],
+                'n': _b64url_uint(self.public_key.n),
+                'e': _b64url_uint(self.public_key.e)
+            }]
+        }
+
+    def write_jwks(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.jwks(), f)
+        return 'file://' + path
+
+    '''
+    token(permissions, expires_in)
+        a signed access token carrying the given permissions
+    '''
+    def token(self, permissions=(), expires_in=3600, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://' + AUTH0_DOMAIN + '/',
+            'sub': 'local|test-user',
+            'aud': API_AUDIENCE,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(permissions)
+        }
+        payload.update(claims)
+        return jwt.encode(payload, self.private_pem, algorithm=ALGORITHMS[0],
+                          headers={'kid': self.kid})
+
+
+'''
+LocalAuth0(signer)
+    a LocalSigner, by default a new one, whose JWKS is written to a
+    temporary file, for test cases:
+        setUpClass      cls.auth0 = LocalAuth0()
+        setUp           self.auth0.install(), auth.jwks_store then reads the file
+        tearDown        self.auth0.uninstall() restores the previous store
+        tearDownClass   cls.auth0.close() removes the file
+    install() returns a fresh JWKSKeyStore each time, so no test sees the
+    key fetches of another
+'''
+class LocalAuth0:
+    def __init__(self, signer=None):
+        self.signer = signer or LocalSigner()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.jwks_url = self.signer.write_jwks(os.path.join(self._tmp_dir.name, 'jwks.json'))
+        self._originals = []
+
+    def install(self):
+        self._originals.append(auth.jwks_store)
+        auth.jwks_store = JWKSKeyStore(self.jwks_url)
+        return auth.jwks_store
+
+    def uninstall(self):
+        auth.jwks_store = self._originals.pop()
+
+    def close(self):
+        self._tmp_dir.cleanup()
+
+    '''
+    headers(permissions)
+        an Authorization header holding a token with those permissions
+    '''
+    def headers(self, permissions=()):
+        return {"Authorization": "Bearer " + self.signer.token(permissions)}
+
+
+'''
+serve_jwks(jwks, delay)
+    starts a stub JWKS server on a free local port in a daemon thread
+    returns (server, url); call server.shutdown() when done
+'''
+def serve_jwks(jwks, delay=0):
+    body = json.dumps(jwks).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        requests_served = 0
+
+        def do_GET(self):
+            Handler.requests_served += 1
+            if delay:
+                time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    server.handler = Handler
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = 'http://127.0.0.1:%d/.well-known/jwks.json' % server.server_port
+    return server, url
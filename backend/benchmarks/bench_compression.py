@@ -0,0 +1,119 @@
+'''
+Bytes on the wire and CPU per request of each response encoding.
+
+Seeds a throw-away SQLite database (or --database-url) with --books books
+and --degrees degrees, then for every encoding and level of --settings
+requests the JSON listings through the Flask test client, --requests
+times each:
+
+    uncached   the response cache is off, every request is serialized and
+               compressed
+    cached     the response cache is on, a request is a cache hit for the
+               payload and its compressed bytes
+
+and prints the body size, its ratio to the uncompressed body, the CPU time
+per request of both runs and the CPU time of compressing the body once.
+
+    cd backend
+    python -m benchmarks.bench_compression --books 5000
+    python -m benchmarks.bench_compression --settings identity,gzip:1,gzip:6,zstd:3
+'''
+import argparse
+import os
+import tempfile
+import time
+
+tmp_dir = tempfile.mkdtemp()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--degrees', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--settings', default='identity,gzip:1,gzip:6,gzip:9,br:1,br:4,br:11,zstd:1,zstd:3,zstd:10',
+                        help='comma separated encoding:level, skipped when the encoding is not installed')
+    return parser.parse_args()
+
+
+args = parse_args()
+# no "test" in the name, so setup_db does not empty the seeded database
+os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tmp_dir, 'bench_compression.db')
+
+import cache
+from app import create_app
+from benchmarks.seed import seed
+from compression import AVAILABLE, compress
+from models import db, setup_db, Book, Degree
+
+PATHS = ('/data/books', '/data/degrees', '/data/books?format=ndjson')
+
+
+def make_client(encoding, level):
+    if encoding == 'identity':
+        config = {'COMPRESS_ENCODINGS': ''}
+    else:
+        config = {'COMPRESS_ENCODINGS': encoding, 'COMPRESS_LEVELS': {encoding: level}}
+    app = create_app(config)
+    setup_db(app, os.environ['DATABASE_URL'])
+    return app.test_client()
+
+
+def use_response_cache(enabled):
+    cache.response_cache = cache.LocalCache(maxsize=256 if enabled else 0)
+    cache.table_versions = cache.TableVersions(cache.response_cache)
+
+
+def cpu_per_request(client, path, headers, n):
+    client.get(path, headers=headers)
+    start = time.process_time()
+    for _ in range(n):
+        body = client.get(path, headers=headers).data
+    return (time.process_time() - start) / n, body
+
+
+def main():
+    settings = []
+    for setting in args.settings.split(','):
+        encoding, _, level = setting.partition(':')
+        if encoding == 'identity' or encoding in AVAILABLE:
+            settings.append((encoding, int(level or 0)))
+
+    client = make_client('identity', 0)
+    with client.application.app_context():
+        seed(db.engine, args.books, args.degrees)
+    Book.touch()
+    Degree.touch()
+
+    print('%d books, %d degrees, CPU ms per request\n' % (args.books, args.degrees))
+    print('%-28s %-10s %10s %7s %10s %10s %11s' % (
+        'path', 'encoding', 'bytes', 'ratio', 'uncached', 'cached', 'compress'))
+    for path in PATHS:
+        raw_size = None
+        for encoding, level in settings:
+            client = make_client(encoding, level)
+            headers = {'Accept-Encoding': encoding}
+            use_response_cache(False)
+            uncached, body = cpu_per_request(client, path, headers, args.requests)
+            use_response_cache(True)
+            cached, _ = cpu_per_request(client, path, headers, args.requests)
+
+            if raw_size is None:
+                raw = client.get(path, headers={'Accept-Encoding': 'identity'}).data
+                raw_size = len(raw)
+            start = time.process_time()
+            if encoding != 'identity':
+                compress(raw, encoding, level)
+            compress_ms = (time.process_time() - start) * 1000
+
+            name = encoding if encoding == 'identity' else '%s:%d' % (encoding, level)
+            print('%-28s %-10s %10d %6.1f%% %10.2f %10.2f %11.2f' % (
+                path, name, len(body), 100.0 * len(body) / raw_size,
+                uncached * 1000, cached * 1000, compress_ms))
+        print()
+
+
+if __name__ == '__main__':
+    main()
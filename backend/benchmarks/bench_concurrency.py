@@ -0,0 +1,145 @@
+'''
+Throughput of the gunicorn worker classes against a slow database.
+
+Seeds a throw-away SQLite database, then for each --worker-classes entry
+starts gunicorn the way the Procfile does, --workers processes and (gthread)
+--threads threads, serving benchmarks.slow_upstream, where every SQL statement
+waits --db-delay seconds. --clients threads then send --requests uncached
+public GETs in total. Prints requests/sec and latency per worker class.
+
+    cd backend
+    python -m benchmarks.bench_concurrency --workers 2 --threads 8 --clients 32
+    python -m benchmarks.bench_concurrency --worker-classes sync,gthread,gevent
+
+Requires gunicorn (and gevent for the gevent workers) on the PATH.
+'''
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from sqlalchemy import create_engine
+
+from auth_stub import LocalSigner
+from benchmarks.seed import seed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(worker_class, args, env):
+    port = free_port()
+    env = dict(env, WORKER_CLASS=worker_class, WORKER_THREADS=str(args.threads),
+               WEB_CONCURRENCY=str(args.workers), PORT=str(port))
+    # started from the repository root with the Procfile's options, as on Heroku
+    process = subprocess.Popen(['gunicorn', '--chdir', 'backend', '--config', 'backend/gunicorn.conf.py',
+                                '--bind', '127.0.0.1:%d' % port, 'benchmarks.slow_upstream:app'],
+                               cwd=os.path.dirname(BACKEND_DIR), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = 'http://127.0.0.1:%d' % port
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urlopen(base + '/status/auth', timeout=1).read()
+            return process, base
+        except (URLError, ConnectionError, socket.timeout):
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError('gunicorn did not start with the %s workers' % worker_class)
+            time.sleep(0.2)
+
+
+def load(base, args):
+    paths = ['/data/books?limit=20', '/data/books/%d', '/data/degrees/%d']
+    latencies, errors = [], []
+    counter = iter(range(args.requests))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            path = paths[i % len(paths)]
+            if '%d' in path:
+                path = path % (i % 100 + 1)
+            start = time.perf_counter()
+            try:
+                urlopen(base + path, timeout=30).read()
+            except Exception as e:
+                errors.append(e)
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return latencies, errors, wall
+
+
+def report(worker_class, latencies, errors, wall):
+    if not latencies:
+        print('%-10s every request failed: %r' % (worker_class, errors[:1]))
+        return
+    latencies.sort()
+    print('%-10s %9.1f %9.1f %9.1f %9.1f %7d' % (
+        worker_class,
+        len(latencies) / wall,
+        statistics.median(latencies) * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        len(errors)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker-classes', default='sync,gthread')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=600)
+    parser.add_argument('--db-delay', type=float, default=0.02,
+                        help='seconds every SQL statement waits')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    # no "test" in the name, so the workers do not reset the database on start-up
+    database_url = 'sqlite:///' + os.path.join(tmp_dir, 'bench_concurrency.db')
+    seed(create_engine(database_url), 1000, 100)
+    env = dict(os.environ,
+               DATABASE_URL=database_url,
+               AUTH0_JWKS_URL=LocalSigner().write_jwks(os.path.join(tmp_dir, 'jwks.json')),
+               SLOW_DB_SECONDS=str(args.db_delay),
+               CACHE_SIZE='0')
+
+    print('%d workers, %d threads per gthread worker, %d clients, %.0f ms per SQL statement\n' % (
+        args.workers, args.threads, args.clients, args.db_delay * 1000))
+    print('%-10s %9s %9s %9s %9s %7s' % ('workers', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+    for worker_class in args.worker_classes.split(','):
+        process, base = start_gunicorn(worker_class, args, env)
+        try:
+            report(worker_class, *load(base, args))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+'''
+Query plans and latency of the list endpoint queries, before and after the
+indexes added in migration cfaf51307fa0.
+
+Seeds --books books (100k by default) and --degrees degrees into a throw-away
+database, runs the queries behind GET /data/books and GET /data/degrees
+without the indexes, creates them, and runs the queries again.
+
+    cd backend
+    python -m benchmarks.bench_indexes --books 100000
+    python -m benchmarks.bench_indexes --database-url postgresql://localhost/life_data_bench
+
+The database at --database-url is dropped and re-created, never point it at
+real data.
+'''
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, func, tuple_
+from sqlalchemy.orm import Session
+
+from benchmarks.seed import seed
+from models import Book, Degree
+
+
+def queries(session):
+    books = session.query(*[getattr(Book, c) for c in Book.long_fields])
+    ordered = books.order_by(Book.date_read, Book.id)
+    return [
+        ('books, full list', ordered),
+        ('books, keyset page', ordered.filter(tuple_(Book.date_read, Book.id) > (date(2005, 6, 1), 0)).limit(21)),
+        ('books, year', Book.filtered(books, year=2005).order_by(Book.date_read, Book.id)),
+        ('books, author', Book.filtered(books, author='Author 7').order_by(Book.date_read, Book.id)),
+        ('books, author count', Book.filtered(session.query(func.count(Book.id)), author='Author 7')),
+        ('books, isbn lookup', books.filter(Book.isbn == '9780000004242')),
+        ('degrees, full list', session.query(Degree).order_by(Degree.year_completed, Degree.id)),
+    ]
+
+
+def explain(engine, query):
+    compiled = query.statement.compile(dialect=engine.dialect)
+    if compiled.positional:
+        params = [compiled.params[name] for name in compiled.positiontup]
+    else:
+        params = compiled.params
+    prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = engine.execute(prefix + str(compiled), params).fetchall()
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+def measure(query, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query.all()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run(engine, label, repeat):
+    print('\n=== %s ===' % label)
+    session = Session(bind=engine)
+    for name, query in queries(session):
+        print('%-22s %9.2f ms' % (name, measure(query, repeat)))
+        for line in explain(engine, query):
+            print('    ' + line)
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--degrees', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')
+    engine = create_engine(database_url)
+
+    start = time.perf_counter()
+    seed(engine, args.books, args.degrees, indexes=False)
+    print('seeded %d books and %d degrees in %.1fs' % (args.books, args.degrees, time.perf_counter() - start))
+
+    run(engine, 'without indexes', args.repeat)
+    for table in (Book.__table__, Degree.__table__):
+        for index in table.indexes:
+            index.create(engine)
+    engine.execute('ANALYZE')
+    run(engine, 'with indexes', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Serialization throughput of a large GET /data/books payload with Flask's
+stdlib based JSONEncoder and json_provider.FastJSONEncoder (orjson).
+
+    cd backend
+    python -m benchmarks.bench_json --books 20000
+'''
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from flask import Flask, jsonify
+from flask.json import JSONEncoder
+
+from json_provider import FastJSONEncoder, configure_json, orjson
+from serializers import month_year
+
+
+def payload(n):
+    first_day = date(1990, 1, 1)
+    books = [{
+        'id': i,
+        'isbn': str(9780000000000 + i),
+        'title': 'Book %d' % i,
+        'author': 'Author %d' % (i % 2000),
+        'year_published': str(1900 + i % 120),
+        'date_read': month_year(first_day + timedelta(days=i % 10000))
+    } for i in range(n)]
+    return {"success": True, "total_books": n, "books": books}
+
+
+def measure(name, app, data, repeat):
+    timings = []
+    with app.test_request_context():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = jsonify(data).get_data()
+            timings.append(time.perf_counter() - start)
+    elapsed = statistics.median(timings)
+    print('%-28s %8.2f ms   %8.1f MB/s   %9d bytes' % (
+        name, elapsed * 1000, len(body) / elapsed / 1e6, len(body)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    data = payload(args.books)
+
+    for name, encoder, env in [('stdlib, pretty (debug)', JSONEncoder, 'development'),
+                               ('stdlib, compact', JSONEncoder, 'production'),
+                               ('FastJSONEncoder, compact', FastJSONEncoder, 'production')]:
+        app = Flask(__name__)
+        app.env = env
+        app.debug = env == 'development'
+        configure_json(app, encoder)
+        measure(name, app, data, args.repeat)
+
+    if orjson is None:
+        print('orjson is not installed, FastJSONEncoder fell back to the stdlib')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+'''
+Write latency with and without the in-process JWKS cache.
+
+Boots the app against a throw-away SQLite database, points auth.py at a stub
+JWKS server that answers after --delay seconds (a slow Auth0) and times
+authenticated POST /data/degrees requests.
+
+    cd backend
+    python -m benchmarks.bench_jwks --requests 50 --delay 0.05
+'''
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp_dir, 'bench_jwks_test.db')
+
+import auth
+from app import app
+from auth_stub import LocalSigner, serve_jwks
+from jwks import JWKSKeyStore
+
+
+def run(client, token, n, offset):
+    latencies = []
+    for i in range(n):
+        degree = {
+            "category": "Course",
+            "institution": "Benchmark",
+            "location": "Online",
+            "title": "Benchmark degree %d" % (offset + i),
+            "url": None,
+            "year_completed": "2020"
+        }
+        start = time.perf_counter()
+        res = client.post('/data/degrees', json=degree,
+                          headers={"Authorization": "Bearer " + token})
+        latencies.append(time.perf_counter() - start)
+        assert res.status_code == 200, res.data
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    print('%-12s mean %7.2f ms   p50 %7.2f ms   p95 %7.2f ms' % (
+        name,
+        statistics.mean(latencies) * 1000,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.05,
+                        help='seconds the stub JWKS server waits before answering')
+    args = parser.parse_args()
+
+    signer = LocalSigner()
+    server, url = serve_jwks(signer.jwks(), delay=args.delay)
+    token = signer.token(['post:degrees'])
+    client = app.test_client()
+
+    try:
+        auth.jwks_store = JWKSKeyStore(url, ttl=0)
+        report('no cache', run(client, token, args.requests, 0))
+
+        auth.jwks_store = JWKSKeyStore(url)
+        report('cached', run(client, token, args.requests, args.requests))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
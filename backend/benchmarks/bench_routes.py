@@ -0,0 +1,365 @@
+'''
+Latency and throughput of every route of create_app.
+
+Boots the app against a throw-away SQLite database (or --database-url),
+verifies tokens against a locally generated key pair instead of Auth0, seeds
+--books books and --degrees degrees and sends --requests requests to each
+endpoint through the Flask test client, from --concurrency threads.
+
+Reads run first, then the writes: every POST creates the rows a later DELETE
+removes, so the tables end the run at the size they were seeded with.
+Every endpoint of app.url_map needs a workload in endpoints(); the run stops
+before measuring anything when one is missing.
+
+Prints p50/p95/p99 latency and requests per second per endpoint, and saves
+them as json under benchmarks/results/ (or --output) with the commit they
+were measured on. --compare prints the change against an earlier result.
+
+    cd backend
+    python -m benchmarks.bench_routes --books 10000 --degrees 500
+    python -m benchmarks.bench_routes --no-response-cache --compare benchmarks/results/routes-ec294d2.json
+
+The database at --database-url is dropped and re-created, never point it at
+real data; its name must contain "test".
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+tmp_dir = tempfile.mkdtemp()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--degrees', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads')
+    parser.add_argument('--batch-size', type=int, default=10, help='items per batch request')
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='run every GET through its view instead of the response cache')
+    parser.add_argument('--only', help='comma separated substrings, only matching endpoints run')
+    parser.add_argument('--output', help='json file to write, default benchmarks/results/routes-<commit>.json')
+    parser.add_argument('--compare', help='earlier json result to compare with')
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tmp_dir, 'bench_routes_test.db')
+
+import auth
+import cache
+from app import app
+from auth_stub import LocalSigner
+from benchmarks.seed import seed
+from jwks import JWKSKeyStore
+from models import db, Book, Degree
+
+
+'''
+Workload
+    the rows the endpoints read and write. Reads and updates go to seeded
+    ids, POSTs hand the ids they create to the DELETEs of the same table.
+'''
+class Workload:
+    def __init__(self, n_books, n_degrees, batch_size):
+        self.n = {'books': n_books, 'degrees': n_degrees}
+        self.batch_size = batch_size
+        self.created = {'books': [], 'degrees': []}
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    def serial(self):
+        with self._lock:
+            self._serial += 1
+            return self._serial
+
+    def seeded_id(self, table, i):
+        return i % self.n[table] + 1
+
+    def keep(self, table, response):
+        ids = [record['id'] for record in response.get_json()[table]]
+        with self._lock:
+            self.created[table].extend(ids)
+
+    def take(self, table, count):
+        with self._lock:
+            taken = self.created[table][-count:]
+            del self.created[table][-count:]
+        if len(taken) < count:
+            raise RuntimeError('no created %s left to delete' % table)
+        return taken
+
+    def book(self):
+        serial = self.serial()
+        return {
+            "author": "Benchmark Author %d" % (serial % 100),
+            "date_read": "2020-05-01",
+            "isbn": str(9790000000000 + serial),
+            "title": "Benchmark book %d" % serial,
+            "year_published": "2019"
+        }
+
+    def degree(self):
+        serial = self.serial()
+        return {
+            "category": "Course",
+            "institution": "Benchmark",
+            "location": "Online",
+            "title": "Benchmark degree %d" % serial,
+            "url": None,
+            "year_completed": "2020"
+        }
+
+
+'''
+endpoints(workload)
+    [(name, endpoint, request)] in the order they run, endpoint being the
+    Flask endpoint the request reaches; request(i) returns the arguments of
+    the i-th call to the test client, plus an optional function that
+    receives the response
+'''
+def endpoints(w):
+    def get(path):
+        return lambda i: ('GET', path, {}, None)
+
+    def get_each(table):
+        return lambda i: ('GET', '/data/%s/%d' % (table, w.seeded_id(table, i)), {}, None)
+
+    def post(table, item):
+        return lambda i: ('POST', '/data/' + table, {'json': item()},
+                          lambda res: w.keep(table, res))
+
+    def patch(table):
+        def request(i):
+            id = w.seeded_id(table, i)
+            return ('PATCH', '/data/%s/%d' % (table, id),
+                    {'json': {"title": "Benchmark %s %d rev %d" % (table, id, w.serial())}}, None)
+        return request
+
+    def delete(table):
+        return lambda i: ('DELETE', '/data/%s/%d' % (table, w.take(table, 1)[0]), {}, None)
+
+    def post_batch(table, item):
+        return lambda i: ('POST', '/data/%s/batch' % table,
+                          {'json': [item() for _ in range(w.batch_size)]},
+                          lambda res: w.keep(table, res))
+
+    def patch_batch(table):
+        def request(i):
+            items = []
+            for j in range(w.batch_size):
+                id = w.seeded_id(table, i * w.batch_size + j)
+                items.append({"id": id, "title": "Benchmark %s %d rev %d" % (table, id, w.serial())})
+            return ('PATCH', '/data/%s/batch' % table, {'json': items}, None)
+        return request
+
+    def delete_batch(table):
+        return lambda i: ('DELETE', '/data/%s/batch' % table,
+                          {'json': w.take(table, w.batch_size)}, None)
+
+    def get_by_isbn(i):
+        # seeded isbns, the valid ISBN-13s among them are found through isbn13
+        return ('GET', '/data/books/isbn/%d' % (9780000000000 + w.seeded_id('books', i) - 1), {}, None)
+
+    def get_asset(i):
+        entry = app.extensions['assets']['favicon/techie2.png']
+        return ('GET', '/assets/' + entry['url'], {}, None)
+
+    return [
+        ('GET /', 'index', get('/')),
+        ('GET /degrees', 'degrees', get('/degrees')),
+        ('GET /reading', 'reading', get('/reading')),
+        ('GET /projects', 'projects', get('/projects')),
+        ('GET /resources/<file>', 'static', get('/resources/favicon/techie2.png')),
+        ('GET /assets/<file>', 'asset', get_asset),
+        ('GET /data', 'data_index', get('/data')),
+        ('GET /data/books', 'retrieve_books', get('/data/books')),
+        ('GET /data/books?limit=20', 'retrieve_books', get('/data/books?limit=20')),
+        ('GET /data/books?year=2005', 'retrieve_books', get('/data/books?year=2005')),
+        ('GET /data/books?author=...', 'retrieve_books', get('/data/books?author=Author%207')),
+        ('GET /data/books?fields=title,author', 'retrieve_books', get('/data/books?fields=title,author')),
+        ('GET /data/books?format=ndjson', 'retrieve_books', get('/data/books?format=ndjson')),
+        ('GET /data/books/<id>', 'retrieve_book', get_each('books')),
+        ('GET /data/books/isbn/<isbn>', 'retrieve_book_by_isbn', get_by_isbn),
+        ('GET /data/books/stats', 'retrieve_book_stats', get('/data/books/stats')),
+        ('GET /data/degrees', 'retrieve_degrees', get('/data/degrees')),
+        ('GET /data/degrees?format=ndjson', 'retrieve_degrees', get('/data/degrees?format=ndjson')),
+        ('GET /data/degrees/<id>', 'retrieve_degree', get_each('degrees')),
+        ('GET /data/search?q=...', 'search_data', get('/data/search?q=book%2012')),
+        ('GET /data/search?q=...&type=degrees', 'search_data', get('/data/search?q=degree&type=degrees')),
+        ('GET /status/auth', 'auth_status', get('/status/auth')),
+        ('GET /status/db-pool', 'db_pool_status', get('/status/db-pool')),
+        ('GET /metrics', 'metrics', get('/metrics')),
+        ('POST /data/books', 'create_book', post('books', w.book)),
+        ('PATCH /data/books/<id>', 'update_book', patch('books')),
+        ('DELETE /data/books/<id>', 'delete_book', delete('books')),
+        ('POST /data/books/batch', 'create_books_batch', post_batch('books', w.book)),
+        ('PATCH /data/books/batch', 'update_books_batch', patch_batch('books')),
+        ('DELETE /data/books/batch', 'delete_books_batch', delete_batch('books')),
+        ('POST /data/degrees', 'create_degree', post('degrees', w.degree)),
+        ('PATCH /data/degrees/<id>', 'update_degree', patch('degrees')),
+        ('DELETE /data/degrees/<id>', 'delete_degree', delete('degrees')),
+        ('POST /data/degrees/batch', 'create_degrees_batch', post_batch('degrees', w.degree)),
+        ('PATCH /data/degrees/batch', 'update_degrees_batch', patch_batch('degrees')),
+        ('DELETE /data/degrees/batch', 'delete_degrees_batch', delete_batch('degrees')),
+    ]
+
+
+'''
+runnable(endpoints)
+    the endpoints the app serves; exits naming the endpoints of app.url_map
+    that have no workload, so a new route cannot go unmeasured. /metrics is
+    only served with METRICS enabled, /assets/ only measured after a build
+'''
+def runnable(endpoints):
+    served = set(app.view_functions)
+    missing = sorted(served - {endpoint for _, endpoint, _ in endpoints})
+    if missing:
+        sys.exit('no workload in benchmarks/bench_routes.py for: %s' % ', '.join(missing))
+    if not app.extensions['assets']:
+        served.discard('asset')
+    return [(name, request) for name, endpoint, request in endpoints if endpoint in served]
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def call(client, request, i, headers):
+    method, path, kwargs, after = request(i)
+    start = time.perf_counter()
+    res = client.open(path, method=method, headers=headers, **kwargs)
+    res.get_data()
+    elapsed = time.perf_counter() - start
+    if res.status_code >= 400:
+        raise RuntimeError('%s %s returned %d: %s' % (method, path, res.status_code, res.data[:200]))
+    if after:
+        after(res)
+    return elapsed
+
+
+'''
+measure(request, n, warmup, concurrency, headers)
+    runs request n times from `concurrency` threads after `warmup` unmeasured
+    calls, returns the latency summary in milliseconds and the throughput
+'''
+def measure(request, n, warmup, concurrency, headers):
+    client = app.test_client()
+    for i in range(warmup):
+        call(client, request, i, headers)
+
+    latencies, errors = [], []
+
+    def worker(offset):
+        client = app.test_client()
+        try:
+            for i in range(warmup + offset, warmup + n, concurrency):
+                latencies.append(call(client, request, i, headers))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'rps': round(len(ordered) / wall, 1)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def report(results, baseline):
+    print('%-38s %8s %8s %8s %9s' % ('endpoint', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'))
+    for name, result in results.items():
+        line = '%-38s %8.2f %8.2f %8.2f %9.1f' % (
+            name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['rps'])
+        before = baseline.get(name)
+        if before:
+            line += '   p50 %+6.1f%%  req/s %+6.1f%%' % (
+                (result['p50_ms'] / before['p50_ms'] - 1) * 100,
+                (result['rps'] / before['rps'] - 1) * 100)
+        print(line)
+
+
+def main():
+    signer = LocalSigner()
+    auth.jwks_store = JWKSKeyStore(signer.write_jwks(os.path.join(tmp_dir, 'jwks.json')))
+    permissions = ['%s:%s' % (action, table) for action in ('post', 'patch', 'delete')
+                   for table in ('books', 'degrees')]
+    headers = {"Authorization": "Bearer " + signer.token(permissions)}
+
+    if args.no_response_cache:
+        cache.response_cache = cache.LocalCache(maxsize=0)
+        cache.table_versions = cache.TableVersions(cache.response_cache, cache.table_versions.store)
+
+    start = time.perf_counter()
+    with app.app_context():
+        seed(db.engine, args.books, args.degrees)
+    Book.touch()
+    Degree.touch()
+    print('seeded %d books and %d degrees in %.1fs\n' % (args.books, args.degrees, time.perf_counter() - start))
+
+    workload = Workload(args.books, args.degrees, args.batch_size)
+    only = args.only.split(',') if args.only else None
+    results = {}
+    for name, request in runnable(endpoints(workload)):
+        if only and not any(part in name for part in only):
+            continue
+        results[name] = measure(request, args.requests, args.warmup, args.concurrency, headers)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    report(results, baseline)
+
+    commit = git_commit()
+    output = args.output or os.path.join(os.path.dirname(__file__), 'results', 'routes-%s.json' % commit)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': db.engine.dialect.name,
+            'settings': {key: getattr(args, key) for key in
+                         ('books', 'degrees', 'requests', 'warmup', 'concurrency',
+                          'batch_size', 'no_response_cache')},
+            'results': results
+        }, f, indent=2)
+    print('\nsaved to %s' % output, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
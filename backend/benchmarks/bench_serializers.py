@@ -0,0 +1,65 @@
+'''
+Rows per second of the two ways to serialize a book listing:
+ORM instances + Book.long(), versus column tuples + serializers.book_serializer.
+
+    cd backend
+    python -m benchmarks.bench_serializers --books 50000
+'''
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from benchmarks.seed import seed
+from models import Book
+from serializers import book_serializer
+
+
+def orm_path(session):
+    books = session.query(Book).order_by(Book.date_read, Book.id).all()
+    result = [book.long() for book in books]
+    session.expunge_all()
+    return result
+
+
+def column_path(session):
+    serializer = book_serializer()
+    query = serializer.query(session.query(Book)).order_by(Book.date_read, Book.id)
+    return serializer.many(query.all())
+
+
+def measure(name, path, session, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = path(session)
+        timings.append(time.perf_counter() - start)
+    elapsed = statistics.median(timings)
+    print('%-22s %8.1f ms   %10.0f rows/s' % (name, elapsed * 1000, len(rows) / elapsed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    parser.add_argument('--books', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_serializers.db')
+    engine = create_engine(database_url)
+    seed(engine, args.books, 0)
+    session = Session(bind=engine)
+
+    expected = measure('ORM + long()', orm_path, session, args.repeat)
+    actual = measure('columns + serializer', column_path, session, args.repeat)
+    assert actual == expected, 'serializer output differs from long()'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+Synthetic books and degrees for the benchmarks.
+'''
+import random
+from datetime import date, timedelta
+
+from models import db, Book, Degree, normalize_isbn
+
+
+AUTHORS = 2000
+CHUNK = 10000
+
+'''
+seed(engine, n_books, n_degrees, indexes)
+    drops and re-creates the tables, then bulk inserts the rows
+    with indexes=False the tables are left without their secondary indexes
+'''
+def seed(engine, n_books, n_degrees, indexes=True):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    if not indexes:
+        for table in (Book.__table__, Degree.__table__):
+            for index in table.indexes:
+                index.drop(engine)
+
+    rng = random.Random(42)
+    first_day = date(1990, 1, 1)
+    with engine.begin() as conn:
+        for start in range(0, n_books, CHUNK):
+            conn.execute(Book.__table__.insert(), [{
+                'isbn': str(9780000000000 + i),
+                'isbn13': normalize_isbn(str(9780000000000 + i)),
+                'title': 'Book %d' % i,
+                'author': 'Author %d' % rng.randrange(AUTHORS),
+                'year_published': str(rng.randrange(1900, 2020)),
+                'date_read': first_day + timedelta(days=rng.randrange(365 * 30))
+            } for i in range(start, min(start + CHUNK, n_books))])
+        for start in range(0, n_degrees, CHUNK):
+            conn.execute(Degree.__table__.insert(), [{
+                'institution': 'Institution %d' % (i % 50),
+                'title': 'Degree %d' % i,
+                'category': rng.choice(['Course', 'BS', 'MS']),
+                'year_completed': str(rng.randrange(1990, 2020)),
+                'location': 'Online',
+                'url': None
+            } for i in range(start, min(start + CHUNK, n_degrees))])
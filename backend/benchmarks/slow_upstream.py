@@ -0,0 +1,22 @@
+'''
+The app with a slow database, for bench_concurrency.
+
+Every SQL statement waits SLOW_DB_SECONDS (default 0.02) before it runs,
+as it would with a distant or overloaded Postgres.
+
+    gunicorn --config gunicorn.conf.py benchmarks.slow_upstream:app
+'''
+import os
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+
+SLOW_DB_SECONDS = float(os.environ.get('SLOW_DB_SECONDS', 0.02))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def slow_down(conn, cursor, statement, parameters, context, executemany):
+    time.sleep(SLOW_DB_SECONDS)
@@ -0,0 +1,275 @@
+import os
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response, current_app
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+'''
+LocalCache
+    in-process LRU of serialized values, plus counters for TableVersions
+    without a store; counters are kept apart from the LRU so they are never
+    evicted
+    each gunicorn worker gets its own copy, use RedisCache to share one;
+    a per-worker copy is safe, its entries are keyed on the versions
+'''
+class LocalCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def counter(self, name):
+        value = self._counters.get(name)
+        if value is None:
+            with self._lock:
+                value = self._counters.setdefault(name, random.getrandbits(48))
+        return value
+
+    def incr(self, name):
+        with self._lock:
+            value = self._counters.get(name, random.getrandbits(48)) + 1
+            self._counters[name] = value
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+'''
+RedisCache
+    cache shared by every worker through a redis client
+    `client` is anything with redis-py's get/set/delete/incr, see LocalRedis
+    values expire after `ttl` seconds, counters never do
+'''
+class RedisCache:
+    def __init__(self, client, prefix='life-data:', ttl=86400):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def counter(self, name):
+        key = self.prefix + name
+        value = self.client.get(key)
+        if value is None:
+            # start from a random value, a flushed redis never re-issues old versions
+            self.client.set(key, random.getrandbits(48), nx=True)
+            value = self.client.get(key)
+        return int(value)
+
+    def incr(self, name):
+        self.counter(name)
+        return self.client.incr(self.prefix + name)
+
+    def clear(self):
+        pass
+
+
+'''
+LocalRedis
+    stand-in for a redis client, backed by a dict, for tests and local runs
+'''
+class LocalRedis:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and key in self._data:
+                return None
+            if not isinstance(value, bytes):
+                value = str(value).encode('utf-8')
+            self._data[key] = value
+            return True
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, 0)) + 1
+            self._data[key] = str(value).encode('utf-8')
+            return value
+
+
+'''
+make_cache(url)
+    backend for CACHE_URL
+        unset or local://   LocalCache holding CACHE_SIZE responses
+        redis://...         RedisCache, requires the redis package
+        memory://           RedisCache over LocalRedis
+'''
+def make_cache(url=None, size=256):
+    if not url or url.startswith('local://'):
+        return LocalCache(size)
+    if url.startswith('memory://'):
+        return RedisCache(LocalRedis())
+    if url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_URL points to redis but the redis package is not installed')
+        return RedisCache(redis.Redis.from_url(url))
+    raise ValueError(f'Unsupported CACHE_URL: {url}')
+
+
+response_cache = make_cache(os.environ.get('CACHE_URL'), int(os.environ.get('CACHE_SIZE', 256)))
+
+#----------------------------------------------------------------------------#
+# Versions.
+#----------------------------------------------------------------------------#
+
+'''
+TableVersions(backend, store)
+    a write counter per table. Anything derived from a table (ETags, cached
+    responses, counts) is keyed on its version, so a write invalidates it
+    without further bookkeeping.
+    setup_db gives it a store, models.TableVersion: the versions are then
+    read from the database, where triggers bump them inside the transaction
+    of every write, so every worker and every process writing to the
+    database, import_data.py included, sees the same versions whatever the
+    cache backend
+    without a store, e.g. in an app without a database, the counters live in
+    the cache backend and start from a random value, shared between workers
+    only through a shared backend
+    the time of the last write is kept too, see written_at
+'''
+class TableVersions:
+    def __init__(self, backend, store=None):
+        self.backend = backend
+        self.store = store
+        self._written = {}
+
+    def get(self, table):
+        return self.get_many((table,))[0]
+
+    '''
+    get_many(tables)
+        the versions of tables, in a single query with a store
+    '''
+    def get_many(self, tables):
+        if self.store is not None:
+            versions = self.store.load(tables)
+            return [str(versions[table][0]) for table in tables]
+        return [str(self.backend.counter('version:' + table)) for table in tables]
+
+    '''
+    bump(table)
+        records a write to table; the store's triggers already counted it
+    '''
+    def bump(self, table):
+        if self.store is None:
+            self.backend.incr('version:' + table)
+        now = time.time()
+        self._written[table] = now
+        self.backend.set('written:' + table, repr(now).encode('ascii'))
+
+    '''
+    written_at(table)
+        epoch seconds of the last write to table seen by this worker, by any
+        worker sharing the backend or, with a store, by the database, 0 if
+        none was seen
+    '''
+    def written_at(self, table):
+        shared = self.backend.get('written:' + table)
+        written = max(self._written.get(table, 0), float(shared) if shared else 0)
+        if self.store is not None:
+            written = max(written, self.store.load((table,))[table][1])
+        return written
+
+
+table_versions = TableVersions(response_cache)
+
+#----------------------------------------------------------------------------#
+# HTTP.
+#----------------------------------------------------------------------------#
+
+'''
+request_etag(tables)
+    strong ETag for the current request: a hash of its path, its query
+    parameters and the versions of the tables the response is built from,
+    read in one query. The versions are shared, so every worker issues the
+    same ETag for the same data, across restarts too
+'''
+def request_etag(tables):
+    key = '|'.join([request.path]
+                   + [f'{k}={v}' for k, v in sorted(request.args.items(multi=True))]
+                   + table_versions.get_many(tables))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+'''
+@conditional(*tables) decorator
+    answers If-None-Match with a 304 before the view runs, so an unchanged
+    resource costs a single version lookup, and tags 200 responses with an ETag
+    the body of every 200 response is kept in response_cache under its
+    ETag, later requests for it are served from there without running the
+    view. A write bumps the table version, so it is never served stale.
+'''
+def conditional(*tables):
+    def conditional_decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            etag = request_etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                cached = response_cache.get('response:' + etag)
+                if cached is not None:
+                    mimetype, _, body = cached.partition(b'\n')
+                    response = current_app.response_class(body, mimetype=mimetype.decode('ascii'))
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.is_streamed:
+                        response_cache.set('response:' + etag,
+                                           response.mimetype.encode('ascii') + b'\n' + response.get_data())
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'public, no-cache'
+            return response
+
+        return wrapper
+    return conditional_decorator
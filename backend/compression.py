@@ -0,0 +1,172 @@
+import gzip
+import os
+import zlib
+
+from flask import request
+
+import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+'''
+Negotiated response compression, for the JSON API.
+
+init_compression(app) compresses every 200 response of a compressible type
+that has no Content-Encoding yet with the first of COMPRESS_ENCODINGS the
+client accepts: zstd and brotli when their packages are installed, gzip
+always. Bodies under COMPRESS_MIN_SIZE bytes are sent as they are.
+
+A response carrying an ETag, i.e. one served through @conditional, has its
+compressed bytes kept in response_cache next to the cached payload, so a
+repeated read is neither serialized nor compressed again. Its ETag, a
+stream's too, is made weak, since the bytes now depend on the encoding;
+If-None-Match still matches it.
+
+Streamed responses (?format=ndjson) are compressed chunk by chunk, each
+chunk flushed so the client can parse the lines it already received.
+'''
+
+# in order of preference; zstd compresses about as well as brotli at these
+# levels, in less time
+AVAILABLE = tuple(encoding for encoding, module in (('zstd', zstandard), ('br', brotli), ('gzip', zlib))
+                  if module is not None)
+
+DEFAULT_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/css',
+                'application/javascript')
+
+'''
+compress(body, encoding, level)
+    body compressed in one go
+'''
+def compress(body, encoding, level):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    if encoding == 'gzip':
+        # mtime=0 keeps the bytes the same from one run to the next
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return body
+
+'''
+StreamCompressor(encoding, level)
+    compress(data) returns the compressed bytes of data, flushed so that they
+    can be decompressed as soon as they arrive; finish() ends the stream
+'''
+class StreamCompressor:
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'zstd':
+            self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        elif encoding == 'br':
+            self.compressor = brotli.Compressor(quality=level)
+        else:
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        if self.encoding == 'zstd':
+            return (self.compressor.compress(data)
+                    + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress_stream(chunks, encoding, level, charset):
+    compressor = StreamCompressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+'''
+negotiate(accept_encodings, offered)
+    the first of offered with the highest quality in Accept-Encoding, or
+    None when the client accepts none of them
+'''
+def negotiate(accept_encodings, offered):
+    encoding = accept_encodings.best_match(offered)
+    return encoding if encoding in offered else None
+
+
+def levels_from_environ(environ=os.environ):
+    return {encoding: int(environ.get('COMPRESS_LEVEL_' + encoding.upper(), level))
+            for encoding, level in DEFAULT_LEVELS.items()}
+
+
+'''
+init_compression(app)
+    compresses responses after every request, configured by
+    COMPRESS_ENCODINGS   comma separated subset of AVAILABLE, empty disables
+    COMPRESS_MIN_SIZE    smaller bodies are left alone, default 1024 bytes
+    COMPRESS_LEVEL_ZSTD / _BR / _GZIP, default 3, 4 and 6
+'''
+def init_compression(app):
+    encodings = app.config.setdefault('COMPRESS_ENCODINGS',
+                                      os.environ.get('COMPRESS_ENCODINGS', ','.join(AVAILABLE)))
+    if isinstance(encodings, str):
+        encodings = [encoding.strip() for encoding in encodings.split(',') if encoding.strip()]
+    unknown = set(encodings) - set(AVAILABLE)
+    if unknown:
+        raise ValueError('COMPRESS_ENCODINGS: %s not available, pick from %s'
+                         % (', '.join(sorted(unknown)), ', '.join(AVAILABLE)))
+    offered = [encoding for encoding in AVAILABLE if encoding in encodings]
+    min_size = app.config.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('COMPRESS_MIN_SIZE', 1024)))
+    levels = dict(levels_from_environ(), **app.config.get('COMPRESS_LEVELS', {}))
+    app.config['COMPRESS_LEVELS'] = levels
+
+    @app.after_request
+    def compress_response(response):
+        if (not offered or response.status_code != 200 or response.direct_passthrough
+                or response.mimetype not in COMPRESSIBLE
+                or 'Content-Encoding' in response.headers
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.accept_encodings, offered)
+        if encoding is None:
+            return response
+        level = levels[encoding]
+        etag, weak = response.get_etag()
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, level, response.charset)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < min_size:
+                return response
+            key = 'compressed:%s:%d:%s' % (encoding, level, etag) if etag and not weak else None
+            data = cache.response_cache.get(key) if key else None
+            if data is None:
+                data = compress(body, encoding, level)
+                if key:
+                    cache.response_cache.set(key, data)
+            response.set_data(data)
+        if etag:
+            response.set_etag(etag, weak=True)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,23 @@
+import os
+
+'''
+gunicorn settings, from the environment so they can be tuned per deployment
+    WEB_CONCURRENCY   worker processes, default 2
+    WORKER_CLASS      gthread (default), sync, or gevent (requires the gevent package)
+    WORKER_THREADS    requests each gthread worker serves at once, default 8
+    WORKER_TIMEOUT    seconds a worker may stay silent before it is restarted, default 30
+
+A sync worker serves one request at a time, so a request waiting on a slow
+query or on Auth0 holds the whole worker. gthread workers keep serving other
+requests on their remaining threads meanwhile: the waits release the GIL.
+WORKER_CLASS and WORKER_THREADS are exported to the workers, where they size
+the database connection pool (see models.engine_options).
+
+    gunicorn --config gunicorn.conf.py app:app
+'''
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = os.environ.setdefault('WORKER_CLASS', 'gthread')
+threads = int(os.environ.setdefault('WORKER_THREADS', '8')) if worker_class == 'gthread' else 1
+timeout = int(os.environ.get('WORKER_TIMEOUT', 30))
+keepalive = 5
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
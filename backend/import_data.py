@@ -1,41 +1,406 @@
-import pandas as pd
+'''
+Imports the seed CSVs into the database at DATABASE_URL.
+
+    cd backend
+    python import_data.py
+    python import_data.py --books seed_data/reading_log.csv --chunk-size 10000
+    python import_data.py --degrees seed_data/degree_log.csv --database-url postgresql://localhost/life_data
+
+The files are streamed --chunk-size rows at a time, so memory use does not
+grow with their size. Each row is validated like a POST body and matched
+against the table, books by normalized ISBN-13, raw isbn or title, degrees
+by title: new rows are inserted, with COPY on Postgres and an executemany
+elsewhere, changed rows are updated and identical rows are left alone, so a
+re-run writes nothing. Invalid rows, and rows repeating a book or degree
+already seen in the same chunk, are skipped and reported.
+
+--incremental instead compares the file with what the previous incremental
+run loaded from it, recorded in the import_state table: an unchanged file
+is skipped after hashing it, otherwise only the new and changed rows are
+written, and the rows that disappeared from the file are deleted.
+
+The writes bump the table versions through the database triggers, see
+models.TableVersion, so every running worker drops its cached responses.
+'''
+import argparse
+import csv
+import hashlib
+import io
+import json
 import os
-from sqlalchemy import create_engine
+import sys
+import time
+
+from sqlalchemy import create_engine, bindparam, or_, select
+
+from models import Book, Degree, ImportState, values_from_json, chunks
+
+
+#----------------------------------------------------------------------------#
+# Rows.
+#----------------------------------------------------------------------------#
+
+'''
+book_row(record) / degree_row(record)
+    the json-like properties of a csv record, as the POST endpoints take them
+    the reading log splits date_read into year_read and month_day_read, and
+    numbers may carry the '.0' pandas gives to columns holding blanks
+'''
+def book_row(record):
+    row = {name: blank_to_none(record.get(name)) for name in Book.properties}
+    if row['date_read'] is None and record.get('year_read'):
+        row['date_read'] = '%s-%s' % (integer(record['year_read']), record.get('month_day_read', ''))
+    row['isbn'] = integer(row['isbn'])
+    row['year_published'] = integer(row['year_published'])
+    return row
+
+def degree_row(record):
+    row = {name: blank_to_none(record.get(name)) for name in Degree.properties}
+    row['year_completed'] = integer(row['year_completed'])
+    return row
+
+def blank_to_none(value):
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+def integer(value):
+    if value and value.endswith('.0') and value[:-2].isdigit():
+        return value[:-2]
+    return value
+
+
+'''
+(model, default csv, csv record -> row, match keys in order of preference)
+'''
+SOURCES = {
+    'books': (Book, 'seed_data/reading_log.csv', book_row, ('isbn13', 'isbn', 'title')),
+    'degrees': (Degree, 'seed_data/degree_log.csv', degree_row, ('title',)),
+}
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+'''
+ImportStats
+    counters of one import, printed as it goes
+'''
+class ImportStats:
+    max_errors = 20
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.read = self.inserted = self.updated = self.deleted = self.unchanged = 0
+        self.skipped = 0
+        self.errors = []
+
+    def skip(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append('line %d: %s' % (line, message))
+
+    @property
+    def written(self):
+        return self.inserted + self.updated + self.deleted
+
+    def report(self, file=sys.stdout):
+        elapsed = time.perf_counter() - self.start
+        print('%s: %d rows in %.3fs (%.0f rows/s), %d inserted, %d updated, %d deleted, %d unchanged, %d skipped' % (
+            self.name, self.read, elapsed, self.read / elapsed if elapsed else 0,
+            self.inserted, self.updated, self.deleted, self.unchanged, self.skipped), file=file)
+
+
+def read_csv(path, to_row, stats):
+    with open(path, newline='', encoding='utf-8') as f:
+        # line 1 is the header
+        for line, record in enumerate(csv.DictReader(f), start=2):
+            stats.read += 1
+            yield line, to_row(record)
+
+
+def read_chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+'''
+existing_rows(conn, table, keys, chunk)
+    {(key, value): row} of the rows of table matching any key of the chunk
+'''
+def existing_rows(conn, table, keys, chunk):
+    conditions = []
+    for key in keys:
+        values = list({values[key] for _, values in chunk if values.get(key) is not None})
+        if values:
+            conditions.append(table.c[key].in_(values))
+    found = {}
+    if conditions:
+        for row in conn.execute(table.select().where(or_(*conditions))):
+            row = dict(row)
+            for key in keys:
+                if row[key] is not None:
+                    found[(key, row[key])] = row
+    return found
+
+
+'''
+plan_chunk(conn, model, keys, chunk, stats)
+    splits a chunk of (line, values) into rows to insert and rows to update,
+    with their 'id'; values not matching an existing row by any key are new
+    also returns every values not skipped, unchanged ones included
+'''
+def plan_chunk(conn, model, keys, chunk, stats):
+    table = model.__table__
+    found = existing_rows(conn, table, keys, chunk)
+    inserts, updates, accepted, seen = [], [], [], set()
+    for line, values in chunk:
+        claimed = [(key, values[key]) for key in keys if values.get(key) is not None]
+        if any(k in seen for k in claimed):
+            stats.skip(line, 'repeats a row earlier in the file')
+            continue
+        seen.update(claimed)
+
+        current = next((found[k] for k in claimed if k in found), None)
+        owner = found.get(('title', values['title']))
+        if owner is not None and (current is None or owner['id'] != current['id']):
+            stats.skip(line, 'title belongs to another row')
+            continue
+        accepted.append(values)
+        if current is None:
+            inserts.append(values)
+        elif any(current[name] != value for name, value in values.items()):
+            updates.append(dict(values, id=current['id']))
+        else:
+            stats.unchanged += 1
+    return inserts, updates, accepted
+
+
+def insert_rows(conn, table, rows):
+    if not rows:
+        return
+    columns = list(rows[0])
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+        buffer = io.StringIO()
+        for row in rows:
+            # unquoted empty fields are NULL, every value is quoted
+            buffer.write(','.join('' if row[c] is None else '"%s"' % str(row[c]).replace('"', '""')
+                                  for c in columns))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (table.name, ', '.join(columns)),
+                           buffer)
+    else:
+        conn.execute(table.insert(), rows)
+
+
+def update_rows(conn, table, rows):
+    if not rows:
+        return
+    columns = [c for c in rows[0] if c != 'id']
+    statement = (table.update()
+                 .where(table.c.id == bindparam('b_id'))
+                 .values({c: bindparam('v_' + c) for c in columns}))
+    conn.execute(statement, [dict({'v_' + c: row[c] for c in columns}, b_id=row['id']) for row in rows])
+
+
+'''
+import_rows(engine, model, keys, rows, stats, chunk_size, after_chunk)
+    upserts (line, values) pairs, one transaction per chunk
+    after_chunk(conn, accepted), when given, runs in each chunk's transaction
+'''
+def import_rows(engine, model, keys, rows, stats, chunk_size, after_chunk=None, progress_every=2.0):
+    last_progress = time.perf_counter()
+    for chunk in read_chunks(rows, chunk_size):
+        with engine.begin() as conn:
+            inserts, updates, accepted = plan_chunk(conn, model, keys, chunk, stats)
+            insert_rows(conn, model.__table__, inserts)
+            update_rows(conn, model.__table__, updates)
+            if after_chunk:
+                after_chunk(conn, accepted)
+        stats.inserted += len(inserts)
+        stats.updated += len(updates)
+        if time.perf_counter() - last_progress >= progress_every:
+            stats.report()
+            last_progress = time.perf_counter()
+
+
+def validated(model, lines, stats):
+    for line, row in lines:
+        try:
+            yield line, values_from_json(row, model.properties, derived=model.derived)
+        except ValueError as e:
+            stats.skip(line, str(e))
+
+
+'''
+import_file(engine, name, path, chunk_size)
+    imports one csv into the table of SOURCES[name], returns its ImportStats
+'''
+def import_file(engine, name, path, chunk_size=5000):
+    model, _, to_row, keys = SOURCES[name]
+    stats = ImportStats(name)
+    import_rows(engine, model, keys, validated(model, read_csv(path, to_row, stats), stats), stats, chunk_size)
+    return stats
+
+
+#----------------------------------------------------------------------------#
+# Incremental import.
+#----------------------------------------------------------------------------#
+
+FILE_KEY = ''
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def row_key(keys, values):
+    for key in keys:
+        if values.get(key) is not None:
+            return '%s:%s' % (key, values[key])
+
+def row_hash(values):
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+'''
+IncrementalState
+    the import_state rows of one source, loaded in memory: {key: (hash, id)}
+    it holds a short hash per row, a few dozen bytes, not the rows themselves
+'''
+class IncrementalState:
+    table = ImportState.__table__
+
+    def __init__(self, engine, source):
+        self.engine = engine
+        self.source = source
+        self.rows = {}
+
+    def file_unchanged(self, digest):
+        with self.engine.connect() as conn:
+            stored = conn.execute(select([self.table.c.row_hash]).where(
+                (self.table.c.source == self.source) & (self.table.c.key == FILE_KEY))).scalar()
+        return stored == digest
+
+    def load(self):
+        with self.engine.connect() as conn:
+            self.rows = {row.key: (row.row_hash, row.record_id) for row in conn.execute(
+                self.table.select().where(self.table.c.source == self.source))}
+
+    # entries: [(key, hash, record id)]
+    def save(self, conn, entries):
+        keys = [key for key, _, _ in entries]
+        self.forget(conn, keys)
+        if entries:
+            conn.execute(self.table.insert(), [
+                {'source': self.source, 'key': key, 'row_hash': digest, 'record_id': id}
+                for key, digest, id in entries])
+
+    def forget(self, conn, keys):
+        for chunk in chunks(keys):
+            conn.execute(self.table.delete().where(
+                (self.table.c.source == self.source) & self.table.c.key.in_(chunk)))
+
 
-degrees = pd.read_csv('seed_data/degree_log.csv')
+'''
+import_incremental(engine, name, path, chunk_size)
+    syncs the table of SOURCES[name] with one csv, writing only what changed
+    since the previous incremental import of that source, returns its ImportStats
+'''
+def import_incremental(engine, name, path, chunk_size=5000):
+    model, _, to_row, keys = SOURCES[name]
+    table = model.__table__
+    stats = ImportStats(name)
+    digest = file_hash(path)
+    state = IncrementalState(engine, name)
+    if state.file_unchanged(digest):
+        return stats
+    state.load()
 
-degrees.drop('Unnamed: 0', axis=1, inplace=True)
-degrees.info()
+    # keys found in the file, ids of the rows they map to, hashes of the changed rows
+    seen, claimed_ids, hashes = set(), set(), {}
 
-db_url = os.environ.get('DATABASE_URL')
-eng = create_engine(db_url)
-degrees.to_sql('degrees', con=eng, if_exists='append', index=False)
-print("Imported Degrees")
-print(degrees)
+    def changed(rows):
+        for line, values in rows:
+            key = row_key(keys, values)
+            if key in seen:
+                stats.skip(line, 'repeats a row earlier in the file')
+                continue
+            seen.add(key)
+            digest = row_hash(values)
+            known = state.rows.get(key)
+            if known is not None and known[0] == digest:
+                stats.unchanged += 1
+                claimed_ids.add(known[1])
+                continue
+            hashes[key] = digest
+            yield line, values
 
+    def record(conn, accepted):
+        titles = [values['title'] for values in accepted]
+        ids = {}
+        for chunk in chunks(titles):
+            ids.update(tuple(row) for row in conn.execute(
+                select([table.c.title, table.c.id]).where(table.c.title.in_(chunk))))
+        entries = []
+        for values in accepted:
+            key = row_key(keys, values)
+            entries.append((key, hashes.pop(key), ids[values['title']]))
+        claimed_ids.update(id for _, _, id in entries)
+        state.save(conn, entries)
 
+    rows = validated(model, read_csv(path, to_row, stats), stats)
+    import_rows(engine, model, keys, changed(rows), stats, chunk_size, after_chunk=record)
 
-books = pd.read_csv('seed_data/reading_log.csv')
-books.info()
+    with engine.begin() as conn:
+        gone = [key for key in state.rows if key != FILE_KEY and key not in seen]
+        # a row whose key changed, e.g. a book that got an isbn, was claimed again
+        ids = [state.rows[key][1] for key in gone if state.rows[key][1] not in claimed_ids]
+        for chunk in chunks(ids):
+            stats.deleted += conn.execute(table.delete().where(table.c.id.in_(chunk))).rowcount
+        state.forget(conn, gone)
+        state.save(conn, [(FILE_KEY, digest, None)])
+    return stats
 
-books.drop('Unnamed: 0', axis=1, inplace=True)
-books.info()
 
-books.isbn.duplicated().sum()
-books.drop_duplicates('isbn', inplace=True)
-books.isbn.duplicated().sum()
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--books', help='reading log csv, default %s' % SOURCES['books'][1])
+    parser.add_argument('--degrees', help='degree log csv, default %s' % SOURCES['degrees'][1])
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--incremental', action='store_true',
+                        help='only write what changed since the last --incremental run')
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error('set DATABASE_URL or pass --database-url')
 
+    paths = {'books': args.books, 'degrees': args.degrees}
+    if not any(paths.values()):
+        paths = {name: source[1] for name, source in SOURCES.items()}
 
-books.year_read.update(books.year_read.astype(str))
-books.loc[:, "date_read"] = books.year_read + '-' + books.month_day_read
-books.drop(['year_read', 'month_day_read'], axis=1, inplace=True)
-books.head()
-books.info()
+    engine = create_engine(args.database_url)
+    for name in ('degrees', 'books'):
+        if paths[name]:
+            run = import_incremental if args.incremental else import_file
+            stats = run(engine, name, paths[name], args.chunk_size)
+            stats.report()
+            for error in stats.errors:
+                print('    ' + error)
 
-books.isbn.update(books.isbn.astype(str))
-books.year_published.update(books.year_published.astype(str))
-books.info()
 
-books.to_sql('books', con=eng, if_exists='append', index=False)
-print("Imported Books")
-print(books.head())
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+'''
+Per-request timing, opt-in with METRICS_ENABLED=1.
+
+Every request records its wall time, the number and total duration of its
+SQL statements, the time spent verifying its token and the size of its
+response. The totals are sent back in a Server-Timing header and aggregated
+per endpoint into histograms served by GET /metrics in the Prometheus text
+format. Histograms are kept per process, each gunicorn worker exposes its own.
+'''
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+'''
+Histogram(buckets)
+    cumulative histogram with Prometheus semantics: a bucket counts the
+    observations less than or equal to its upper bound
+'''
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+'''
+Metrics
+    histograms per (method, endpoint) and request counts per status code
+    endpoint is the url rule, e.g. /data/books/<int:id>, so ids do not
+    create a series each
+'''
+class Metrics:
+    histograms = (
+        ('request_duration_seconds', 'wall time of the request', DURATION_BUCKETS),
+        ('request_db_seconds', 'time spent executing SQL statements', DURATION_BUCKETS),
+        ('request_sql_statements', 'SQL statements executed', STATEMENT_BUCKETS),
+        ('request_auth_seconds', 'time spent in verify_decode_jwt', DURATION_BUCKETS),
+        ('response_bytes', 'size of the response body', BYTES_BUCKETS),
+    )
+
+    def __init__(self, prefix='life_data_'):
+        self.prefix = prefix
+        self._series = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method, endpoint, status, values):
+        with self._lock:
+            series = self._series.get((method, endpoint))
+            if series is None:
+                series = self._series[(method, endpoint)] = {
+                    name: Histogram(buckets) for name, _, buckets in self.histograms}
+            for name, value in values.items():
+                series[name].observe(value)
+            key = (method, endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._requests.clear()
+
+    '''
+    render()
+        every metric in the Prometheus text exposition format
+    '''
+    def render(self):
+        lines = []
+        with self._lock:
+            name = self.prefix + 'requests_total'
+            lines.append(f'# HELP {name} requests served')
+            lines.append(f'# TYPE {name} counter')
+            for (method, endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'{name}{{method="{method}",endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+
+            for metric, help, _ in self.histograms:
+                name = self.prefix + metric
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} histogram')
+                for (method, endpoint), series in sorted(self._series.items()):
+                    labels = f'method="{method}",endpoint="{_escape(endpoint)}"'
+                    histogram = series[metric]
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+metrics = Metrics()
+
+STATS_KEY = 'life_data.request_stats'
+
+#----------------------------------------------------------------------------#
+# Recording.
+#----------------------------------------------------------------------------#
+
+'''
+RequestStats
+    what the current request spent so far, kept in the WSGI environ while
+    instrumentation is enabled, which unlike flask.g lasts until the end of
+    a streamed response
+'''
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_statements = 0
+        self.db_seconds = 0
+        self.auth_seconds = 0
+
+    def server_timing(self, wall):
+        return (f'app;dur={wall * 1000:.2f}, '
+                f'db;dur={self.db_seconds * 1000:.2f};desc="{self.sql_statements} queries", '
+                f'auth;dur={self.auth_seconds * 1000:.2f}')
+
+
+def current_stats():
+    if has_request_context():
+        return request.environ.get(STATS_KEY)
+    return None
+
+
+'''
+timed(kind)
+    context manager adding the time spent in its block to the current
+    request's '<kind>_seconds', a no-op outside instrumented requests
+'''
+@contextmanager
+def timed(kind):
+    stats = current_stats()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, kind + '_seconds', getattr(stats, kind + '_seconds') + time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start'].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+'''
+init_metrics(app)
+    instruments app: hooks every SQLAlchemy engine, times each request and
+    registers GET /metrics
+'''
+def init_metrics(app):
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_timer():
+        request.environ[STATS_KEY] = RequestStats()
+
+    @app.after_request
+    def record_request(response):
+        stats = current_stats()
+        if stats is None or request.endpoint == 'metrics':
+            return response
+        method, status = request.method, response.status_code
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        response.headers['Server-Timing'] = stats.server_timing(time.perf_counter() - stats.start)
+
+        def observe(size):
+            metrics.observe(method, rule, status, {
+                'request_duration_seconds': time.perf_counter() - stats.start,
+                'request_db_seconds': stats.db_seconds,
+                'request_sql_statements': stats.sql_statements,
+                'request_auth_seconds': stats.auth_seconds,
+                'response_bytes': size
+            })
+
+        if response.is_streamed:
+            # the body, and the queries behind it, are produced after this hook
+            # returns, the stream is measured when it is closed
+            response.response = _counting(response.response, observe)
+        elif response.direct_passthrough:
+            observe(response.content_length or 0)
+        else:
+            observe(len(response.get_data()))
+        return response
+
+    @app.route('/metrics', methods=['GET'], endpoint='metrics')
+    def serve_metrics():
+        return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _counting(iterable, observe):
+    size = 0
+    try:
+        for chunk in iterable:
+            size += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+        observe(size)
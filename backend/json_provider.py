@@ -0,0 +1,53 @@
+from flask.json import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+'''
+FastJSONEncoder
+    Flask JSON encoder that serializes through orjson when it is installed
+    and falls back to the stdlib json module otherwise. Pass it, or any other
+    JSONEncoder subclass, to create_app(json_encoder=...).
+
+    dates, datetimes and dataclasses still go through JSONEncoder.default,
+    so the output matches Flask's. Unlike the stdlib, orjson writes non-ascii
+    characters as utf-8 instead of \\u escapes. Pretty printed output (debug
+    mode) always uses the stdlib, unless compact is set, which ignores any
+    indentation asked for.
+'''
+class FastJSONEncoder(JSONEncoder):
+    compact = False
+    if orjson is not None:
+        options = (orjson.OPT_PASSTHROUGH_DATETIME
+                   | orjson.OPT_PASSTHROUGH_DATACLASS
+                   | orjson.OPT_NON_STR_KEYS)
+
+    def encode(self, o):
+        if self.compact:
+            self.indent = None
+            self.item_separator, self.key_separator = ',', ':'
+        if orjson is not None and self.indent is None:
+            options = self.options | orjson.OPT_SORT_KEYS if self.sort_keys else self.options
+            try:
+                return orjson.dumps(o, default=self.default, option=options).decode('utf-8')
+            except TypeError:
+                # e.g. integers beyond 64 bits, which the stdlib handles
+                pass
+        return super().encode(o)
+
+
+'''
+configure_json(app, json_encoder)
+    installs json_encoder, FastJSONEncoder by default, on app
+    in production output is compact even if debug or JSONIFY_PRETTYPRINT_REGULAR
+    ask for pretty printing
+'''
+def configure_json(app, json_encoder=None):
+    json_encoder = json_encoder or FastJSONEncoder
+    if app.env == 'production':
+        app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        if issubclass(json_encoder, FastJSONEncoder):
+            json_encoder = type(json_encoder.__name__, (json_encoder,), {'compact': True})
+    app.json_encoder = json_encoder
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from urllib.request import urlopen
+
+
+logger = logging.getLogger(__name__)
+
+'''
+JWKSKeyStore
+    in-process cache of the Auth0 JSON Web Key Set, keyed by key id (kid)
+
+    keys are fetched once and re-used for `ttl` seconds. A daemon thread
+    refreshes the set before it expires so requests never wait on Auth0.
+    An unknown kid (e.g. after a key rotation) forces a re-fetch, at most
+    once every `min_refetch_interval` seconds.
+    If a fetch fails the last-known-good set keeps being served. When
+    `snapshot_path` is given, every good set is written there and loaded
+    on start-up, so a fresh worker can boot while Auth0 is unreachable.
+
+    `url` may be any url urlopen understands, including file:// paths, so
+    the store can run against a local JWKS file or a stub HTTP server.
+    A ttl of 0 disables caching: every lookup fetches the set again.
+'''
+class JWKSKeyStore:
+    def __init__(self, url, ttl=3600, min_refetch_interval=30, timeout=5, snapshot_path=None):
+        self.url = url
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.snapshot_path = snapshot_path
+        self.fetches = 0
+        self.fetch_errors = 0
+        self._keys = {}
+        self._fetched_at = 0
+        self._last_forced = 0
+        self._lock = threading.Lock()
+        self._refresher_pid = None
+        if snapshot_path and os.path.exists(snapshot_path):
+            self._load_snapshot()
+
+    '''
+    get_key(kid)
+        returns the public key matching kid, or None if Auth0 does not know it
+    '''
+    def get_key(self, kid):
+        if not self.ttl:
+            self.refresh()
+            return self._keys.get(kid)
+
+        self._ensure_refresher()
+        if not self._keys or self._is_stale():
+            self.refresh(only_if_stale=True)
+
+        key = self._keys.get(kid)
+        if key is None and self._may_force_refetch():
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    '''
+    refresh()
+        fetches the key set; on failure the previous set is kept
+        returns True if a new set was loaded
+    '''
+    def refresh(self, only_if_stale=False):
+        with self._lock:
+            # another thread may have refreshed while we waited for the lock
+            if only_if_stale and self._keys and not self._is_stale():
+                return False
+            try:
+                self.fetches += 1
+                with urlopen(self.url, timeout=self.timeout) as response:
+                    jwks = json.loads(response.read())
+                self.load(jwks)
+            except Exception:
+                self.fetch_errors += 1
+                logger.exception('Unable to fetch JWKS from %s, keeping %d cached keys',
+                                 self.url, len(self._keys))
+                if self._keys and self.ttl:
+                    # keep serving the last-known-good set, retry a little later
+                    self._fetched_at = time.monotonic() - self.ttl + self.min_refetch_interval
+                return False
+
+        if self.snapshot_path:
+            self._save_snapshot(jwks)
+        return True
+
+    '''
+    load(jwks)
+        replaces the cached keys with the ones in a JWKS document
+    '''
+    def load(self, jwks):
+        keys = {}
+        for key in jwks['keys']:
+            keys[key['kid']] = {
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key['use'],
+                'n': key['n'],
+                'e': key['e']
+            }
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def stats(self):
+        return {
+            'keys': len(self._keys),
+            'fetches': self.fetches,
+            'fetch_errors': self.fetch_errors,
+            'age_seconds': round(time.monotonic() - self._fetched_at, 1) if self._fetched_at else None
+        }
+
+    def _is_stale(self):
+        return time.monotonic() - self._fetched_at >= self.ttl
+
+    def _may_force_refetch(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_forced < self.min_refetch_interval:
+                return False
+            self._last_forced = now
+            return True
+
+    # started lazily and per process, so gunicorn workers forked after import
+    # each get their own refresher
+    def _ensure_refresher(self):
+        pid = os.getpid()
+        if self._refresher_pid == pid:
+            return
+        with self._lock:
+            if self._refresher_pid == pid:
+                return
+            self._refresher_pid = pid
+        thread = threading.Thread(target=self._refresh_loop, name='jwks-refresh', daemon=True)
+        thread.start()
+
+    def _refresh_loop(self):
+        interval = max(self.ttl * 0.8, 1)
+        while True:
+            time.sleep(interval)
+            self.refresh()
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path) as f:
+                self.load(json.load(f))
+            # treat the snapshot as stale so the first request tries Auth0 first
+            self._fetched_at = time.monotonic() - self.ttl
+        except Exception:
+            logger.exception('Unable to load JWKS snapshot from %s', self.snapshot_path)
+
+    def _save_snapshot(self, jwks):
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(jwks, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            logger.exception('Unable to write JWKS snapshot to %s', self.snapshot_path)
@@ -0,0 +1,72 @@
+"""add table_versions, bumped by triggers on books and degrees
+
+Revision ID: 3c7d9e2f1a54
+Revises: 8e4a1f6c2d93
+Create Date: 2026-10-18 20:12:48.530716
+
+"""
+import random
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7d9e2f1a54'
+down_revision = '8e4a1f6c2d93'
+branch_labels = None
+depends_on = None
+
+TABLES = ('books', 'degrees')
+
+# same statements as models.version_triggers
+NOW_SQL = {
+    'sqlite': "(julianday('now') - 2440587.5) * 86400.0",
+    'postgresql': 'extract(epoch from clock_timestamp())',
+}
+
+
+def triggers(table, dialect):
+    bump = ("UPDATE table_versions SET version = version + 1, written_at = %s WHERE name = %s"
+            % (NOW_SQL[dialect], 'TG_TABLE_NAME' if dialect == 'postgresql' else "'%s'" % table))
+    if dialect == 'sqlite':
+        return ['CREATE TRIGGER tr_%s_version_%s AFTER %s ON %s BEGIN %s; END'
+                % (table, operation.lower(), operation, table, bump)
+                for operation in ('INSERT', 'UPDATE', 'DELETE')]
+    return [
+        'CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$ '
+        'BEGIN %s; RETURN NULL; END $$' % bump,
+        'CREATE TRIGGER tr_%s_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s '
+        'FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()' % (table, table)
+    ]
+
+
+def upgrade():
+    versions = op.create_table('table_versions',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('written_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # random starting points, so that no version of another database is re-issued
+    op.bulk_insert(versions, [{'name': table, 'version': random.getrandbits(48), 'written_at': 0}
+                              for table in TABLES])
+
+    dialect = op.get_bind().dialect.name
+    if dialect in NOW_SQL:
+        for table in TABLES:
+            for statement in triggers(table, dialect):
+                op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        if dialect == 'sqlite':
+            for operation in ('insert', 'update', 'delete'):
+                op.execute('DROP TRIGGER IF EXISTS tr_%s_version_%s' % (table, operation))
+        elif dialect == 'postgresql':
+            op.execute('DROP TRIGGER IF EXISTS tr_%s_version ON %s' % (table, table))
+    if dialect == 'postgresql':
+        op.execute('DROP FUNCTION IF EXISTS bump_table_version()')
+    op.drop_table('table_versions')
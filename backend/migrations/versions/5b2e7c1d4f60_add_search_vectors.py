@@ -0,0 +1,42 @@
+"""add full-text search vectors to books and degrees
+
+Revision ID: 5b2e7c1d4f60
+Revises: 0d3c5e8a9b71
+Create Date: 2026-10-18 16:40:12.903514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e7c1d4f60'
+down_revision = '0d3c5e8a9b71'
+branch_labels = None
+depends_on = None
+
+# same expressions as search.SEARCH_COLUMNS, generated columns need Postgres 12
+VECTORS = {
+    'books': "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+             "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+             "setweight(to_tsvector('simple', coalesce(isbn, '')), 'C')",
+    'degrees': "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+               "setweight(to_tsvector('simple', coalesce(institution, '')), 'B')",
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, vector in VECTORS.items():
+        op.execute('ALTER TABLE %s ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (%s) STORED'
+                   % (table, vector))
+        op.create_index('ix_%s_search_vector' % table, table, ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in VECTORS:
+        op.drop_index('ix_%s_search_vector' % table, table_name=table)
+        op.drop_column(table, 'search_vector')
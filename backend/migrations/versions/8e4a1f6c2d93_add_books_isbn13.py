@@ -0,0 +1,69 @@
+"""add the normalized books.isbn13 with a unique index
+
+Revision ID: 8e4a1f6c2d93
+Revises: 5b2e7c1d4f60
+Create Date: 2026-10-18 18:05:33.271904
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4a1f6c2d93'
+down_revision = '5b2e7c1d4f60'
+branch_labels = None
+depends_on = None
+
+
+# a frozen copy of models.normalize_isbn as of this revision, so the
+# backfill does not change with the application code
+def normalize_isbn(value):
+    if value is None:
+        return None
+    digits = re.sub(r'[\s-]', '', str(value)).upper()
+    if re.fullmatch(r'\d{8}[\dX]', digits):
+        digits = '0' + digits
+    if re.fullmatch(r'\d{9}[\dX]', digits):
+        weighted = sum((10 - i) * (10 if c == 'X' else int(c)) for i, c in enumerate(digits))
+        if weighted % 11:
+            return None
+        digits = '978' + digits[:9]
+        return digits + isbn13_check_digit(digits)
+    if re.fullmatch(r'97[89]\d{10}', digits) and isbn13_check_digit(digits[:12]) == digits[12]:
+        return digits
+    return None
+
+
+def isbn13_check_digit(digits):
+    weighted = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(digits))
+    return str(-weighted % 10)
+
+
+def upgrade():
+    op.add_column('books', sa.Column('isbn13', sa.String(length=13), nullable=True))
+
+    # backfill from isbn; a book repeating the isbn of an older one keeps
+    # isbn13 empty, so that the unique index can be built
+    books = sa.table('books', sa.column('id', sa.Integer), sa.column('isbn', sa.String),
+                     sa.column('isbn13', sa.String))
+    conn = op.get_bind()
+    seen, params = set(), []
+    for id, isbn in conn.execute(sa.select([books.c.id, books.c.isbn]).order_by(books.c.id)):
+        normalized = normalize_isbn(isbn)
+        if normalized is not None and normalized not in seen:
+            seen.add(normalized)
+            params.append({'b_id': id, 'v_isbn13': normalized})
+    if params:
+        conn.execute(books.update()
+                     .where(books.c.id == sa.bindparam('b_id'))
+                     .values(isbn13=sa.bindparam('v_isbn13')), params)
+
+    op.create_index('ix_books_isbn13', 'books', ['isbn13'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_books_isbn13', table_name='books')
+    op.drop_column('books', 'isbn13')
@@ -1,22 +1,400 @@
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer, DATE
-from datetime import datetime
+import os
+import re
+import random
+import threading
+from flask import request, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import (Column, String, Integer, BigInteger, Float, DATE, DDL, Index, func, bindparam,
+                        event, orm, or_)
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
+from datetime import datetime, date
 
+import cache
 
-db = SQLAlchemy()
+#----------------------------------------------------------------------------#
+# Engine.
+#----------------------------------------------------------------------------#
+
+'''
+Connection pool defaults per gunicorn worker class (WORKER_CLASS, WORKER_THREADS)
+    sync      one request at a time, a small pool covers it and a streamed response
+    gthread   one connection per thread, as many again for bursts
+    gevent    many concurrent greenlets per worker, capped by the overflow
+'''
+POOL_DEFAULTS = {
+    'sync': lambda threads: (2, 2),
+    'gthread': lambda threads: (threads, threads),
+    'gevent': lambda threads: (10, 20),
+    'eventlet': lambda threads: (10, 20),
+}
+
+'''
+engine_options(db_full_path, environ)
+    SQLAlchemy engine options for SQLALCHEMY_ENGINE_OPTIONS, from the environment
+        DB_POOL_SIZE             connections kept open by each worker
+        DB_MAX_OVERFLOW          extra connections opened under load, closed once returned
+        DB_POOL_TIMEOUT          seconds a request waits for a connection, default 10
+        DB_POOL_RECYCLE          seconds after which a connection is replaced, default 1800
+        DB_POOL_PRE_PING         test connections before use, default 1, so a Postgres
+                                 restart costs a reconnect instead of a failed request
+        DB_STATEMENT_TIMEOUT_MS  Postgres statement_timeout, default 30000, 0 disables it
+    pool size and overflow default by worker class, see POOL_DEFAULTS
+    in-memory SQLite keeps Flask-SQLAlchemy's single shared connection
+'''
+def engine_options(db_full_path, environ=os.environ):
+    url = make_url(db_full_path)
+    if url.drivername.startswith('sqlite') and url.database in (None, '', ':memory:'):
+        return {}
+
+    worker_class = environ.get('WORKER_CLASS', 'sync')
+    threads = int(environ.get('WORKER_THREADS', 1))
+    pool_size, max_overflow = POOL_DEFAULTS.get(worker_class, POOL_DEFAULTS['sync'])(threads)
+    options = {
+        'pool_size': int(environ.get('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_timeout': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes'),
+    }
+    if url.drivername.startswith('postgres'):
+        statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+        if statement_timeout:
+            options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    elif url.drivername.startswith('sqlite'):
+        # SQLAlchemy 1.3 opens a new sqlite connection per checkout unless told
+        # to pool them, pooled connections then move between threads
+        options['poolclass'] = QueuePool
+        options['connect_args'] = {'check_same_thread': False}
+    return options
+
+
+'''
+PoolStats
+    counts, for one engine, the DBAPI connections opened and the checkouts
+    served from its pool; checkouts much larger than connects means requests
+    reuse connections
+'''
+class PoolStats:
+    def __init__(self, engine):
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'connect', self._count('connects'))
+        event.listen(engine, 'checkout', self._count('checkouts'))
+        event.listen(engine, 'invalidate', self._count('invalidated'))
+
+    def _count(self, name):
+        def listener(*args):
+            with self._lock:
+                setattr(self, name, getattr(self, name) + 1)
+        return listener
+
+    def stats(self):
+        pool = self.engine.pool
+        stats = {
+            'pool': type(pool).__name__,
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'invalidated': self.invalidated
+        }
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, name, None)
+            if method is not None:
+                stats[name] = method()
+        return stats
+
+
+REPLICA = 'replica'
+READ_REPLICA_KEY = 'life_data.read_replica'
+
+'''
+RoutingSession
+    sends the statements of a request marked with use_read_replica() to the
+    replica engine, the REPLICA bind, and everything else, flushes included,
+    to the primary
+'''
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        if (not self._flushing and has_request_context()
+                and request.environ.get(READ_REPLICA_KEY)):
+            return db.get_engine(self.app, bind=REPLICA)
+        return super().get_bind(mapper, clause)
+
+
+def use_read_replica():
+    # kept in the WSGI environ, which a streamed response still sees
+    request.environ[READ_REPLICA_KEY] = True
+
+
+class Database(SQLAlchemy):
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        engine.pool_stats = PoolStats(engine)
+        return engine
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+db = Database()
 
 '''
-setup_db(app)
+setup_db(app, db_full_path, read_full_path)
     binds a flask application and a SQLAlchemy service
+    engine options come from the environment (see engine_options), unless
+    the app config already holds SQLALCHEMY_ENGINE_OPTIONS
+    read_full_path, optional, is a replica of db_full_path the public GET
+    routes read from, see replica.py
+    table versions are read from the database from then on, see TableVersion
 '''
-def setup_db(app, db_full_path):
+def setup_db(app, db_full_path, read_full_path=None):
     app.config["SQLALCHEMY_DATABASE_URI"] = db_full_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(db_full_path))
+    if read_full_path:
+        app.config["SQLALCHEMY_BINDS"] = {REPLICA: read_full_path}
     db.app = app
     db.init_app(app)
+    cache.table_versions.store = TableVersion
     if 'test' in db_full_path:
         db.drop_all()
         db.create_all()
+        Book.touch()
+        Degree.touch()
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+
+'''
+text(length, nullable) / iso_date
+    parsers for json properties, they return the column value or raise ValueError
+'''
+def text(length, nullable=False):
+    def parse(name, value):
+        if value is None and nullable:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            raise ValueError(f'{name} must be a string')
+        value = str(value)
+        if not value and not nullable:
+            raise ValueError(f'{name} must not be empty')
+        if len(value) > length:
+            raise ValueError(f'{name} is longer than {length} characters')
+        return value
+    return parse
+
+def iso_date(name, value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a YYYY-MM-DD date')
+
+'''
+normalize_isbn(value)
+    the ISBN-13 digits of an ISBN-13 or ISBN-10, ignoring spaces and dashes,
+    or None when value is not a valid ISBN. A 9 digit SBN, or an ISBN-10 that
+    lost its leading zero as a number in a spreadsheet, gets the zero back
+'''
+def normalize_isbn(value):
+    if value is None:
+        return None
+    digits = re.sub(r'[\s-]', '', str(value)).upper()
+    if re.fullmatch(r'\d{8}[\dX]', digits):
+        digits = '0' + digits
+    if re.fullmatch(r'\d{9}[\dX]', digits):
+        weighted = sum((10 - i) * (10 if c == 'X' else int(c)) for i, c in enumerate(digits))
+        if weighted % 11:
+            return None
+        digits = '978' + digits[:9]
+        return digits + isbn13_check_digit(digits)
+    if re.fullmatch(r'97[89]\d{10}', digits) and isbn13_check_digit(digits[:12]) == digits[12]:
+        return digits
+    return None
+
+def isbn13_check_digit(digits):
+    weighted = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(digits))
+    return str(-weighted % 10)
+
+'''
+values_from_json(data, properties, partial, derived)
+    validated column values of a json object, properties maps each allowed
+    property to its parser
+    every property is required, unless partial, in which case missing and
+    falsy properties are skipped as the PATCH endpoints always did
+    derived maps further columns to (property, function) and fills each
+    from its property whenever that is among the values
+    raises ValueError describing the first problem found
+'''
+def values_from_json(data, properties, partial=False, derived=None):
+    if not isinstance(data, dict):
+        raise ValueError('expected a json object')
+    for key in data:
+        if key not in properties:
+            raise ValueError(f'unknown property {key}')
+
+    values = {}
+    for name, parse in properties.items():
+        if name not in data:
+            if partial:
+                continue
+            raise ValueError(f'missing property {name}')
+        if partial and not data[name]:
+            continue
+        values[name] = parse(name, data[name])
+    for column, (name, function) in (derived or {}).items():
+        if name in values:
+            values[column] = function(values[name])
+    return values
+
+#----------------------------------------------------------------------------#
+# Bulk writes.
+#----------------------------------------------------------------------------#
+
+BULK_CHUNK = 500
+
+def chunks(items, size=BULK_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+'''
+ids_by(model, column, values)
+    {value: id} of the rows whose column holds one of values, looked up in chunked IN queries
+'''
+def ids_by(model, column, values):
+    found = {}
+    for chunk in chunks(list(set(values))):
+        found.update(db.session.query(column, model.id).filter(column.in_(chunk)))
+    return found
+
+'''
+taken_column(model, values, id)
+    the first column of model.unique whose value in values already belongs to
+    a row other than id, or None, in one query over the unique indexes
+'''
+def taken_column(model, values, id=None):
+    columns = [column for column in model.unique if values.get(column) is not None]
+    if not columns:
+        return None
+    query = (db.session.query(*[getattr(model, column) for column in columns])
+             .filter(or_(*[getattr(model, column) == values[column] for column in columns])))
+    if id is not None:
+        query = query.filter(model.id != id)
+    row = query.first()
+    if row is None:
+        return None
+    return next(column for column, value in zip(columns, row) if value == values[column])
+
+'''
+write_many(model, statements, atomic)
+    runs [(statement, params, indexes)] in one transaction, each params list as
+    one executemany, indexes holding the batch position of every params entry
+    if the transaction fails and atomic is False, the statements are retried one
+    row at a time so that every row that can be written is
+    returns {batch index of a failed row: message}
+'''
+def write_many(model, statements, atomic=True):
+    failed = {}
+    try:
+        for statement, params, _ in statements:
+            if params:
+                db.session.execute(statement, params)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        if atomic:
+            raise
+        for statement, params, indexes in statements:
+            for param, index in zip(params, indexes):
+                try:
+                    db.session.execute(statement, param)
+                    db.session.commit()
+                except IntegrityError as e:
+                    db.session.rollback()
+                    failed[index] = str(e.orig).strip()
+    model.touch()
+    return failed
+
+'''
+insert_many(model, rows, indexes, atomic)
+    inserts rows, dicts of column values, with a single executemany
+'''
+def insert_many(model, rows, indexes, atomic=True):
+    return write_many(model, [(model.__table__.insert(), rows, indexes)], atomic)
+
+'''
+update_many(model, rows, indexes, atomic)
+    updates rows, dicts of column values including the 'id' of the row to
+    update, with one executemany per distinct set of updated columns
+'''
+def update_many(model, rows, indexes, atomic=True):
+    table = model.__table__
+    groups = {}
+    for row, index in zip(rows, indexes):
+        columns = tuple(sorted(k for k in row if k != 'id'))
+        if columns:
+            params, group_indexes = groups.setdefault(columns, ([], []))
+            params.append(dict({'v_' + k: row[k] for k in columns}, b_id=row['id']))
+            group_indexes.append(index)
+
+    statements = [(table.update()
+                        .where(table.c.id == bindparam('b_id'))
+                        .values({k: bindparam('v_' + k) for k in columns}), params, group_indexes)
+                  for columns, (params, group_indexes) in groups.items()]
+    return write_many(model, statements, atomic)
+
+'''
+delete_many(model, ids)
+    deletes the rows with the given ids in one DELETE ... WHERE id IN per chunk
+'''
+def delete_many(model, ids):
+    for chunk in chunks(ids):
+        model.query.filter(model.id.in_(chunk)).delete(synchronize_session=False)
+    db.session.commit()
+    model.touch()
+
+'''
+update_returning(model, id, values, columns)
+    sets values on the row with that id and returns its columns, in a single
+    UPDATE ... RETURNING; dialects without RETURNING, e.g. SQLite under
+    SQLAlchemy 1.3, get an UPDATE and then a SELECT
+    returns None when no row has that id; a value clashing with a unique
+    index raises the IntegrityError, after rolling back
+'''
+def update_returning(model, id, values, columns):
+    table = model.__table__
+    statement = table.update().where(table.c.id == id).values(values)
+    try:
+        if not values:
+            row = db.session.query(*columns).filter(model.id == id).first()
+        elif db.session.get_bind(model.__mapper__).dialect.implicit_returning:
+            row = db.session.execute(statement.returning(*columns)).first()
+        else:
+            updated = db.session.execute(statement).rowcount
+            row = db.session.query(*columns).filter(model.id == id).first() if updated else None
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if values and row is not None:
+        model.touch()
+    return row
+
+'''
+delete_one(model, id)
+    deletes the row with that id in a single DELETE, without loading it
+    returns whether there was one
+'''
+def delete_one(model, id):
+    deleted = db.session.execute(model.__table__.delete().where(model.id == id)).rowcount
+    db.session.commit()
+    if deleted:
+        model.touch()
+    return bool(deleted)
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -27,19 +405,48 @@ class Book(db.Model):
     __tablename__ = 'books'
     id = Column(Integer, primary_key=True)
     isbn = Column(String(50))
+    # isbn normalized by normalize_isbn(), None when isbn is not a valid ISBN
+    isbn13 = Column(String(13))
     title = Column(String(500), nullable=False, unique=True)
     author = Column(String(200), nullable=False)
     year_published = Column(String(4))
     date_read = Column(DATE, nullable=False, default=datetime.today())
 
+    # back the ORDER BY date_read, id of the list endpoint, its keyset
+    # cursor and the year / author filters
+    __table_args__ = (
+        Index('ix_books_date_read_id', 'date_read', 'id'),
+        Index('ix_books_author_date_read_id', 'author', 'date_read', 'id'),
+        Index('ix_books_isbn', 'isbn'),
+        Index('ix_books_isbn13', 'isbn13', unique=True),
+    )
+
+    long_fields = ('id', 'isbn', 'isbn13', 'title', 'author', 'year_published', 'date_read')
+
+    properties = {
+        'isbn': text(50, nullable=True),
+        'title': text(500),
+        'author': text(200),
+        'year_published': text(4, nullable=True),
+        'date_read': iso_date
+    }
+
+    derived = {
+        'isbn13': ('isbn', normalize_isbn)
+    }
+
+    # columns no two books may share, checked before every write
+    unique = ('title', 'isbn13')
+
     '''
     insert()
         inserts a new model into the database
-        the model must have a unique isbn & title
+        the model must have a unique isbn13 & title
     '''
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        Book.touch()
 
     '''
     delete()
@@ -49,6 +456,7 @@ class Book(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        Book.touch()
 
     '''
     update()
@@ -57,6 +465,74 @@ class Book(db.Model):
     '''
     def update(self):
         db.session.commit()
+        Book.touch()
+
+    '''
+    touch()
+        records a write to the books table: bumps its version
+    '''
+    @staticmethod
+    def touch():
+        cache.table_versions.bump(Book.__tablename__)
+
+    '''
+    filtered(query, year, author)
+        restricts a query to the books read in year and/or written by author
+    '''
+    @staticmethod
+    def filtered(query, year=None, author=None):
+        if year is not None:
+            query = query.filter(Book.date_read >= date(year, 1, 1),
+                                 Book.date_read < date(year + 1, 1, 1))
+        if author is not None:
+            query = query.filter(Book.author == author)
+        return query
+
+    '''
+    count(year, author)
+        number of books matching the filters, kept in response_cache under
+        the version of the books table, so a write by any worker replaces it
+    '''
+    @staticmethod
+    def count(year=None, author=None):
+        key = 'count:books:%s:%s:%s' % (cache.table_versions.get(Book.__tablename__), year, author)
+        total = cache.response_cache.get(key)
+        if total is None:
+            total = Book.filtered(db.session.query(func.count(Book.id)), year, author).scalar()
+            cache.response_cache.set(key, str(total).encode('ascii'))
+            return total
+        return int(total)
+
+    '''
+    stats(top)
+        reading statistics computed by the database, for GET /data/books/stats:
+        totals, first and last read dates, average books per month between
+        them, books and authors per year read and the top authors by number
+        of books. Nothing in it depends on the current date, so a response
+        built from it stays valid until the next write
+    '''
+    @staticmethod
+    def stats(top=10):
+        total, authors, first, last = db.session.query(
+            func.count(Book.id), func.count(func.distinct(Book.author)),
+            func.min(Book.date_read), func.max(Book.date_read)).one()
+        year = func.extract('year', Book.date_read).label('year')
+        per_year = (db.session.query(year, func.count(Book.id), func.count(func.distinct(Book.author)))
+                    .group_by(year).order_by(year))
+        books = func.count(Book.id).label('books')
+        top_authors = (db.session.query(Book.author, books)
+                       .group_by(Book.author).order_by(books.desc(), Book.author).limit(top))
+
+        months = (last.year - first.year) * 12 + last.month - first.month + 1 if total else 0
+        return {
+            'total_books': total,
+            'total_authors': authors,
+            'first_read': first.isoformat() if first else None,
+            'last_read': last.isoformat() if last else None,
+            'books_per_month': round(total / months, 2) if months else 0,
+            'per_year': [{'year': int(y), 'books': n, 'authors': a} for y, n, a in per_year],
+            'top_authors': [{'author': author, 'books': n} for author, n in top_authors]
+        }
 
     '''
     long()
@@ -66,6 +542,7 @@ class Book(db.Model):
         return {
             'id': self.id,
             'isbn': self.isbn,
+            'isbn13': self.isbn13,
             'title': self.title,
             'author': self.author,
             'year_published': self.year_published,
@@ -86,6 +563,25 @@ class Degree(db.Model):
     location = Column(String(200))
     url = Column(String(1024))
 
+    long_fields = ('id', 'institution', 'title', 'category', 'year_completed', 'location', 'url')
+
+    properties = {
+        'institution': text(200),
+        'title': text(500),
+        'category': text(50),
+        'year_completed': text(4),
+        'location': text(200, nullable=True),
+        'url': text(1024, nullable=True)
+    }
+
+    derived = {}
+
+    unique = ('title',)
+
+    __table_args__ = (
+        Index('ix_degrees_year_completed_id', 'year_completed', 'id'),
+    )
+
     '''
     insert()
         inserts a new model into the database
@@ -94,6 +590,7 @@ class Degree(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        Degree.touch()
 
     '''
     delete()
@@ -103,6 +600,7 @@ class Degree(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        Degree.touch()
 
     '''
     update()
@@ -111,6 +609,15 @@ class Degree(db.Model):
     '''
     def update(self):
         db.session.commit()
+        Degree.touch()
+
+    '''
+    touch()
+        records a write to the degrees table: bumps its version
+    '''
+    @staticmethod
+    def touch():
+        cache.table_versions.bump(Degree.__tablename__)
 
     '''
     long()
@@ -128,4 +635,107 @@ class Degree(db.Model):
         }
 
     def __repr__(self):
-        return f'<Degree — Title: {self.title}, Inst.: {self.author}, year: {self.year_completed}>'
\ No newline at end of file
+        return f'<Degree — Title: {self.title}, Inst.: {self.author}, year: {self.year_completed}>'
+
+############################  IMPORTS  ###########################
+'''
+ImportState
+    what import_data.py --incremental last loaded from each csv: per row,
+    keyed by its isbn or title, a hash of its values and the id of the row it
+    became; the key '' holds the hash of the whole file
+'''
+class ImportState(db.Model):
+    __tablename__ = 'import_state'
+    source = Column(String(50), primary_key=True)
+    key = Column(String(600), primary_key=True)
+    row_hash = Column(String(40), nullable=False)
+    record_id = Column(Integer)
+
+    def __repr__(self):
+        return f'<ImportState — {self.source}: {self.key}>'
+
+############################  VERSIONS  ###########################
+# tables whose writes are counted in table_versions
+VERSIONED_TABLES = ('books', 'degrees')
+
+# epoch seconds by the database clock
+NOW_SQL = {
+    'sqlite': "(julianday('now') - 2440587.5) * 86400.0",
+    'postgresql': 'extract(epoch from clock_timestamp())',
+}
+
+'''
+TableVersion
+    the write counter of a table, behind cache.table_versions: triggers on
+    each of VERSIONED_TABLES bump its row inside the writing transaction,
+    whatever runs the write, so every worker and process agrees on it.
+    Postgres bumps it once per statement, SQLite once per written row.
+    Rows start from a random value, so a re-created database never
+    re-issues the versions, and ETags, of the previous one
+'''
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    # epoch seconds of the last write, by the database clock
+    written_at = Column(Float, nullable=False, default=0)
+
+    '''
+    load(tables)
+        {table: (version, written_at)} in one query, creating missing rows
+    '''
+    @staticmethod
+    def load(tables):
+        query = db.session.query(TableVersion.name, TableVersion.version, TableVersion.written_at)
+        rows = {name: (version, written_at)
+                for name, version, written_at in query.filter(TableVersion.name.in_(tables))}
+        missing = [table for table in tables if table not in rows]
+        if missing:
+            try:
+                db.session.execute(TableVersion.__table__.insert(), TableVersion.seeds(missing))
+                db.session.commit()
+            except IntegrityError:
+                # another worker created them meanwhile
+                db.session.rollback()
+            rows = {name: (version, written_at)
+                    for name, version, written_at in query.filter(TableVersion.name.in_(tables))}
+        return rows
+
+    @staticmethod
+    def seeds(tables):
+        return [{'name': table, 'version': random.getrandbits(48), 'written_at': 0} for table in tables]
+
+    def __repr__(self):
+        return f'<TableVersion — {self.name}: {self.version}>'
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def seed_table_versions(target, connection, **kw):
+    connection.execute(target.insert(), TableVersion.seeds(VERSIONED_TABLES))
+
+
+'''
+version_triggers(table, dialect)
+    the statements creating the triggers that bump the version of table,
+    for 'sqlite' and 'postgresql'; migration 3c7d9e2f1a54 holds a copy
+'''
+def version_triggers(table, dialect):
+    bump = ("UPDATE table_versions SET version = version + 1, written_at = %s WHERE name = %s"
+            % (NOW_SQL[dialect], 'TG_TABLE_NAME' if dialect == 'postgresql' else "'%s'" % table))
+    if dialect == 'sqlite':
+        return ['CREATE TRIGGER tr_%s_version_%s AFTER %s ON %s BEGIN %s; END'
+                % (table, operation.lower(), operation, table, bump)
+                for operation in ('INSERT', 'UPDATE', 'DELETE')]
+    return [
+        'CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$ '
+        'BEGIN %s; RETURN NULL; END $$' % bump,
+        'CREATE TRIGGER tr_%s_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s '
+        'FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()' % (table, table)
+    ]
+
+
+# create_all builds the same triggers as the migration
+for model in (Book, Degree):
+    for dialect in NOW_SQL:
+        for statement in version_triggers(model.__tablename__, dialect):
+            event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect=dialect))
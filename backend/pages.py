@@ -0,0 +1,193 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request, current_app, render_template
+from markupsafe import Markup
+
+import cache
+from compression import brotli, compress, DEFAULT_LEVELS
+from models import db, Book, Degree
+
+'''
+Pre-rendered, pre-compressed pages, for /, /projects, /degrees and /reading.
+
+index.html and projects.html depend on nothing but the asset manifest, read
+once by init_assets, so init_pages(app) renders them once at start-up and
+keeps each with its gzip and, when the brotli package is installed, brotli
+variants. serve_page(name) then answers a page view from memory: it picks
+the smallest variant the client accepts, tags it with a strong ETag built
+from the content hash, and lets browsers and CDNs keep it for PAGE_MAX_AGE
+seconds (default a day).
+
+/degrees and /reading are built from the Degree and Book tables instead,
+see DataPage: their list is a fragment cached under the table version, the
+page around it is assembled and compressed once per version. Every view
+reads the table version, one lookup; only the first view after a write
+also queries the rows and renders the list.
+'''
+
+PAGES = {
+    'index': 'index.html',
+    'projects': 'projects.html',
+}
+
+'''
+encodings in order of preference, when the client accepts several equally
+'''
+ENCODINGS = ('br', 'gzip', 'identity') if brotli else ('gzip', 'identity')
+
+'''
+compressed once, so at the highest levels
+'''
+LEVELS = {'br': 11, 'gzip': 9, 'identity': None}
+
+'''
+recompressed after every write, so at the levels of the API responses
+'''
+DATA_LEVELS = dict(DEFAULT_LEVELS, identity=None)
+
+
+'''
+Page(body)
+    a rendered page: {encoding: (bytes, etag)} for each of ENCODINGS, only
+    keeping a compressed variant that is smaller than the page itself
+'''
+class Page:
+    def __init__(self, body, levels=LEVELS):
+        self.hash = hashlib.sha256(body).hexdigest()[:20]
+        self.variants = {}
+        for encoding in ENCODINGS:
+            data = compress(body, encoding, levels[encoding])
+            if encoding == 'identity' or len(data) < len(body):
+                self.variants[encoding] = (data, f'{self.hash}-{encoding}')
+
+    '''
+    negotiate(accept_encodings)
+        the encoding of the variant to send for an Accept-Encoding header
+    '''
+    def negotiate(self, accept_encodings):
+        offered = [encoding for encoding in ENCODINGS if encoding in self.variants]
+        return accept_encodings.best_match(offered, default='identity')
+
+
+#----------------------------------------------------------------------------#
+# Pages built from the database.
+#----------------------------------------------------------------------------#
+
+'''
+degree_groups() / reading_groups()
+    the template context of the degrees and reading fragments: the degrees
+    by category, the category of the latest degree first, and the books by
+    year read, latest first
+'''
+def degree_groups():
+    groups = OrderedDict()
+    for degree in Degree.query.order_by(Degree.year_completed.desc(), Degree.title):
+        groups.setdefault(degree.category, []).append(degree)
+    return {'groups': list(groups.items())}
+
+def reading_groups():
+    groups = OrderedDict()
+    rows = (db.session.query(Book.title, Book.author, Book.date_read)
+            .order_by(Book.date_read.desc(), Book.id.desc()))
+    for row in rows:
+        groups.setdefault(row.date_read.year, []).append(row)
+    return {'groups': list(groups.items())}
+
+
+'''
+DataPage(template, fragment, tables, context)
+    a page whose fragment template is rendered from context(), a function
+    reading tables. The rendered fragment is cached in response_cache under
+    the versions of tables, shared between workers when it is redis; each
+    worker keeps the assembled, compressed Page of the current versions
+'''
+class DataPage:
+    def __init__(self, template, fragment, tables, context):
+        self.template = template
+        self.fragment = fragment
+        self.tables = tables
+        self.context = context
+        self._current = (None, None)
+        self._lock = threading.Lock()
+
+    def version(self):
+        return ':'.join(cache.table_versions.get_many(self.tables))
+
+    '''
+    page()
+        the Page for the current table versions, built on the first view
+        after a write; the version is read before the rows, so a write
+        racing the build only costs a rebuild on the next view
+    '''
+    def page(self):
+        version = self.version()
+        current_version, page = self._current
+        if current_version == version:
+            return page
+        with self._lock:
+            current_version, page = self._current
+            if current_version != version:
+                page = Page(render_template(self.template, fragment=self.render_fragment(version))
+                            .encode('utf-8'), DATA_LEVELS)
+                self._current = (version, page)
+        return page
+
+    def render_fragment(self, version):
+        key = 'fragment:%s:%s' % (self.fragment, version)
+        html = cache.response_cache.get(key)
+        if html is None:
+            html = render_template(self.fragment, **self.context()).encode('utf-8')
+            cache.response_cache.set(key, html)
+        return Markup(html.decode('utf-8'))
+
+
+DATA_PAGES = {
+    'degrees': ('degrees.html', '_degrees.html', ('degrees',), degree_groups),
+    'reading': ('reading.html', '_reading.html', ('books',), reading_groups),
+}
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+'''
+init_pages(app)
+    renders and compresses every page of PAGES into app.extensions['pages'],
+    and prepares the DATA_PAGES, built on their first view
+'''
+def init_pages(app):
+    app.config.setdefault('PAGE_MAX_AGE', int(os.environ.get('PAGE_MAX_AGE', 24 * 3600)))
+    pages = {}
+    with app.test_request_context():
+        for name, template in PAGES.items():
+            pages[name] = Page(render_template(template).encode('utf-8'))
+    app.extensions['pages'] = pages
+    app.extensions['data_pages'] = {name: DataPage(*args) for name, args in DATA_PAGES.items()}
+
+
+'''
+serve_page(name)
+    the response for a view of page name, a 304 when If-None-Match holds
+    the ETag of the negotiated variant. Pages built from the database are
+    revalidated on every view, the others kept for PAGE_MAX_AGE
+'''
+def serve_page(name):
+    data_page = current_app.extensions['data_pages'].get(name)
+    if data_page is not None:
+        page = data_page.page()
+        cache_control = 'public, no-cache'
+    else:
+        page = current_app.extensions['pages'][name]
+        cache_control = 'public, max-age=%d' % current_app.config['PAGE_MAX_AGE']
+    encoding = page.negotiate(request.accept_encodings)
+    body, etag = page.variants[encoding]
+    response = current_app.response_class(body, mimetype='text/html')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(etag)
+    return response.make_conditional(request)
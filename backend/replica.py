@@ -0,0 +1,80 @@
+import os
+import time
+from functools import wraps
+
+from flask import request, current_app
+
+import cache
+from models import REPLICA, use_read_replica
+
+'''
+Read-replica routing for the public GET routes.
+
+With DATABASE_URL_READ set, @replica_read routes run their queries on the
+replica; everything else, authenticated writes included, stays on the
+primary. A read goes to the primary instead when
+    + the client wrote less than READ_YOUR_WRITES_SECONDS ago (default 5),
+      remembered in the read_primary_until cookie, so it sees its own writes
+    + any of the tables it reads was written less than REPLICA_LAG_SECONDS
+      ago (default 2), so a lagging replica never fills the response cache
+      with a body older than the ETag it is stored under
+'''
+COOKIE = 'read_primary_until'
+
+'''
+init_replica(app)
+    reads the replica settings and sets the read-your-writes cookie on every
+    successful write
+'''
+def init_replica(app):
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS',
+                          float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5)))
+    app.config.setdefault('REPLICA_LAG_SECONDS',
+                          float(os.environ.get('REPLICA_LAG_SECONDS', 2)))
+
+    @app.after_request
+    def remember_write(response):
+        if (request.method in ('POST', 'PATCH', 'PUT', 'DELETE') and response.status_code < 400
+                and has_replica(app)):
+            window = app.config['READ_YOUR_WRITES_SECONDS']
+            response.set_cookie(COOKIE, '%.3f' % (time.time() + window),
+                                max_age=int(window) + 1, httponly=True, samesite='Lax')
+        return response
+
+
+def has_replica(app):
+    return REPLICA in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+'''
+reads_primary(tables)
+    True when the current request must read from the primary, see above
+'''
+def reads_primary(tables):
+    if not has_replica(current_app):
+        return True
+    now = time.time()
+    try:
+        if float(request.cookies.get(COOKIE, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    lag = current_app.config['REPLICA_LAG_SECONDS']
+    return any(cache.table_versions.written_at(table) > now - lag for table in tables)
+
+
+'''
+@replica_read(*tables) decorator
+    runs the route on the replica unless reads_primary(tables)
+    goes under @conditional, so 304s and cached responses skip the check
+'''
+def replica_read(*tables):
+    def replica_read_decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not reads_primary(tables):
+                use_read_replica()
+            return f(*args, **kwargs)
+
+        return wrapper
+    return replica_read_decorator
@@ -0,0 +1,147 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import DDL, event, func, literal_column
+
+import cache
+from models import db, Book, Degree
+
+'''
+Full-text search over books and degrees, for GET /data/search.
+
+On Postgres each table has a generated search_vector tsvector column with a
+GIN index (see SEARCH_COLUMNS and migration 5b2e7c1d4f60), queried with
+prefix tsqueries and ordered by ts_rank. Elsewhere, e.g. SQLite in tests, an
+in-process InvertedIndex is built from the table and rebuilt after a write
+changes the table version.
+
+Both rank a word found in the title above one found in the author or
+institution, above one found in the isbn, and every query word matches as a
+prefix, so 'harp lee' finds 'Harper Lee' while it is being typed.
+'''
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+'''
+(model, [(column, weight)]) per searchable table, weights as Postgres' A-D
+'''
+SEARCH_COLUMNS = {
+    'books': (Book, [('title', 'A'), ('author', 'B'), ('isbn', 'C')]),
+    'degrees': (Degree, [('title', 'A'), ('institution', 'B')]),
+}
+
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+
+def words(text):
+    return WORD.findall(text.lower()) if text else []
+
+
+def search_vector_sql(columns):
+    return ' || '.join("setweight(to_tsvector('simple', coalesce(%s, '')), '%s')" % (column, weight)
+                       for column, weight in columns)
+
+
+# create_all builds the same column and index as the migration on Postgres
+for table, (model, columns) in SEARCH_COLUMNS.items():
+    event.listen(model.__table__, 'after_create', DDL(
+        'ALTER TABLE %s ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (%s) STORED; '
+        'CREATE INDEX ix_%s_search_vector ON %s USING GIN (search_vector)'
+        % (table, search_vector_sql(columns), table, table)).execute_if(dialect='postgresql'))
+
+#----------------------------------------------------------------------------#
+# In-process index.
+#----------------------------------------------------------------------------#
+
+'''
+InvertedIndex(rows, columns)
+    word -> {id: weight} over rows of (id, *column values), the weight of a
+    word in a row being that of the best column holding it
+    search(query_words, limit) returns [(score, id)], best first; a row
+    matches when each query word is a prefix of one of its words, and scores
+    the sum over query words of the best matching weight, halved for a
+    prefix that is not a whole word
+'''
+class InvertedIndex:
+    def __init__(self, rows, columns):
+        postings = defaultdict(dict)
+        weights = [WEIGHTS[weight] for _, weight in columns]
+        for row in rows:
+            id = row[0]
+            for value, weight in zip(row[1:], weights):
+                for word in words(value):
+                    if postings[word].get(id, 0) < weight:
+                        postings[word][id] = weight
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+
+    def matches(self, prefix):
+        scores = {}
+        start = bisect_left(self.vocabulary, prefix)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            factor = 1.0 if word == prefix else 0.5
+            for id, weight in self.postings[word].items():
+                if scores.get(id, 0) < weight * factor:
+                    scores[id] = weight * factor
+        return scores
+
+    def search(self, query_words, limit):
+        total = None
+        for word in query_words:
+            scores = self.matches(word)
+            if total is None:
+                total = scores
+            else:
+                total = {id: score + scores[id] for id, score in total.items() if id in scores}
+            if not total:
+                return []
+        ranked = sorted(total.items(), key=lambda item: (-item[1], item[0]))
+        return [(score, id) for id, score in ranked[:limit]]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+'''
+local_index(table)
+    the InvertedIndex of table for its current version, built on first use
+'''
+def local_index(table):
+    version = cache.table_versions.get(table)
+    cached = _indexes.get(table)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    model, columns = SEARCH_COLUMNS[table]
+    rows = db.session.query(model.id, *[getattr(model, column) for column, _ in columns])
+    index = InvertedIndex(rows, columns)
+    with _lock:
+        _indexes[table] = (version, index)
+    return index
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+'''
+search(table, q, limit)
+    ids of the rows of table matching q, best first
+'''
+def search(table, q, limit):
+    query_words = words(q)
+    if not query_words:
+        return []
+    model, _ = SEARCH_COLUMNS[table]
+    if db.session.get_bind(model.__mapper__).dialect.name == 'postgresql':
+        vector = literal_column('%s.search_vector' % table)
+        tsquery = func.to_tsquery('simple', ' & '.join(word + ':*' for word in query_words))
+        rank = func.ts_rank(vector, tsquery)
+        rows = (db.session.query(model.id)
+                .filter(vector.op('@@')(tsquery))
+                .order_by(rank.desc(), model.id)
+                .limit(limit))
+        return [id for id, in rows]
+    return [id for _, id in local_index(table).search(query_words, limit)]
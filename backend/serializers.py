@@ -0,0 +1,65 @@
+from models import Book, Degree
+
+'''
+Column-only serialization for read-only listings.
+
+A RowSerializer selects just the columns it needs as plain tuples, so the
+ORM never builds, tracks or expires Book/Degree instances, and turns each
+tuple into the exact dict long() would have returned.
+'''
+
+MONTH_ABBR = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+              'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+'''
+month_year(value)
+    same output as value.strftime('%b %Y') in the C locale the app runs in,
+    without going through strftime for every row
+'''
+def month_year(value):
+    return f'{MONTH_ABBR[value.month - 1]} {value.year}'
+
+
+'''
+RowSerializer(model, fields, extra, formatters)
+    fields      the long() properties to output, in order
+    extra       columns to select without outputting them, e.g. for a cursor
+    formatters  {field: function} applied to the raw column value
+'''
+class RowSerializer:
+    def __init__(self, model, fields, extra=(), formatters=None):
+        formatters = formatters or {}
+        self.fields = tuple(fields)
+        selected = self.fields + tuple(name for name in extra if name not in self.fields)
+        self.columns = [getattr(model, name) for name in selected]
+        self._width = len(self.fields)
+        self._formatters = [(i, formatters[name]) for i, name in enumerate(self.fields)
+                            if name in formatters]
+
+    '''
+    query(query)
+        query restricted to the selected columns
+    '''
+    def query(self, query):
+        return query.with_entities(*self.columns)
+
+    def one(self, row):
+        values = list(row[:self._width])
+        for i, format in self._formatters:
+            values[i] = format(values[i])
+        return dict(zip(self.fields, values))
+
+    def many(self, rows):
+        one = self.one
+        return [one(row) for row in rows]
+
+
+'''
+book_serializer(fields, extra) / degree_serializer(fields, extra)
+    serializers producing Book.long() / Degree.long(), or a subset of it
+'''
+def book_serializer(fields=Book.long_fields, extra=()):
+    return RowSerializer(Book, fields, extra, {'date_read': month_year})
+
+def degree_serializer(fields=Degree.long_fields, extra=()):
+    return RowSerializer(Degree, fields, extra)
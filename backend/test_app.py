@@ -1,14 +1,39 @@
 import os
 import unittest
 import json
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 from app import create_app
-from models import setup_db, Book, Degree
+from models import db, setup_db, Book, Degree
 from config import JWT
 
 active_auth={"Authorization": "Bearer {}".format(JWT)}
 
+@contextmanager
+def count_statements(app):
+    """Collects the SQL statements run on the app's engine"""
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def write_statements(app):
+    """Statements a PATCH by id costs: UPDATE ... RETURNING, or UPDATE then SELECT"""
+    with app.app_context():
+        return 1 if db.engine.dialect.implicit_returning else 2
+
+
 class BookTestCase(unittest.TestCase):
     """This class represents the Book test case"""
 
@@ -91,6 +116,17 @@ class BookTestCase(unittest.TestCase):
         self.assertTrue(data['books'])
 
 
+    # @app.route("/data/books/isbn/<isbn>", methods=["GET"]) with the ISBN-10 of a book
+    def test_get_book_by_isbn(self):
+        self.test_create_book2()
+        res = self.client().get('/data/books/isbn/0-446-31078-6')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['books'][0]['title'], self.book2['title'])
+        self.assertEqual(data['books'][0]['isbn13'], self.book2['isbn'])
+
+
     # @app.route("/data/books", methods=["GET"])
     def test_get_books(self):
         self.test_create_book1()
@@ -101,6 +137,90 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(len(data['books']), 2)
 
+
+    # @app.route("/data/books", methods=["GET"]) with limit and cursor
+    def test_get_books_paginated(self):
+        self.test_create_book1()
+        self.test_create_book2()
+        res = self.client().get('/data/books?limit=1')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_books'], 2)
+        self.assertEqual(data['books'][0]['title'], self.book1['title'])
+
+        res = self.client().get('/data/books?limit=1&cursor={}'.format(data['next_cursor']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['books'][0]['title'], self.book2['title'])
+        self.assertIsNone(data['next_cursor'])
+
+
+    # @app.route("/data/books", methods=["GET"]) with filters and fields
+    def test_get_books_filtered(self):
+        self.test_create_book1()
+        self.test_create_book2()
+        res = self.client().get('/data/books?year=2020&author=Harper Lee&fields=title,author')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_books'], 1)
+        self.assertEqual(data['books'], [{"title": self.book2['title'], "author": "Harper Lee"}])
+
+
+    # @app.route("/data/books/stats", methods=["GET"])
+    def test_get_book_stats(self):
+        self.test_create_book1()
+        self.test_create_book2()
+        res = self.client().get('/data/books/stats?top=1')
+        stats = json.loads(res.data)['stats']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((stats['total_books'], stats['total_authors']), (2, 2))
+        self.assertEqual((stats['first_read'], stats['last_read']), ("2020-05-01", "2020-06-01"))
+        self.assertEqual(stats['books_per_month'], 1)
+        self.assertEqual(stats['per_year'], [{"year": 2020, "books": 2, "authors": 2}])
+        self.assertEqual(stats['top_authors'], [{"author": "Harper Lee", "books": 1}])
+
+
+    # @app.route("/data/books/stats", methods=["GET"]) on an empty table and with a bad top
+    def test_get_book_stats_empty(self):
+        res = self.client().get('/data/books/stats')
+        stats = json.loads(res.data)['stats']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((stats['total_books'], stats['first_read'], stats['per_year']), (0, None, []))
+        self.assertEqual(self.client().get('/data/books/stats?top=0').status_code, 400)
+
+    
+    # @app.route("/data/books", methods=["GET"]) as ndjson
+    def test_get_books_ndjson(self):
+        self.test_create_book1()
+        self.test_create_book2()
+        res = self.client().get('/data/books?format=ndjson&fields=title')
+        lines = res.data.decode('utf-8').splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{"title": self.book1['title']}, {"title": self.book2['title']}])
+
+
+    # @app.route("/data/books", methods=["GET"]) with If-None-Match
+    def test_304_on_get_books(self):
+        self.test_create_book1()
+        res = self.client().get('/data/books')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/data/books', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+
+        self.test_create_book2()
+        res = self.client().get('/data/books', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
     
     # @app.route("/data/books/<int:id>", methods=["PATCH"])
     def test_patch_book(self):
@@ -119,11 +239,109 @@ class BookTestCase(unittest.TestCase):
 
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['id_deleted'], 1)
+
+    def test_patch_book_statements(self):
+        self.test_create_book1()
+        with count_statements(self.app) as statements:
+            res = self.client().patch('/data/books/1', json={"year_published": "1800"}, headers=active_auth)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)['books'][0]['title'], self.book1['title'])
+        self.assertEqual(len(statements), write_statements(self.app))
+        self.assertTrue(statements[0].startswith('UPDATE books'))
+
+    def test_patch_book_title_statements(self):
+        self.test_create_book1()
+        with count_statements(self.app) as statements:
+            res = self.client().patch('/data/books/1', json={"title": "A new title"}, headers=active_auth)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)['books'][0]['title'], "A new title")
+        self.assertEqual(len(statements), write_statements(self.app))
+        self.assertTrue(statements[0].startswith('UPDATE books'))
+
+    def test_delete_book_statements(self):
+        self.test_create_book1()
+        with count_statements(self.app) as statements:
+            res = self.client().delete('/data/books/1', headers=active_auth)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('DELETE FROM books'))
     
 
+    # @app.route("/data/books/batch", methods=["POST"])
+    def test_create_books_batch(self):
+        res = self.client().post('/data/books/batch', json={"books": [self.book1, self.book2]}, headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['books']), 2)
+        self.assertEqual(data['errors'], [])
+
+
+    # @app.route("/data/books/batch", methods=["PATCH"])
+    def test_patch_books_batch(self):
+        self.test_create_books_batch()
+        res = self.client().patch('/data/books/batch', json=[
+            {"id": 1, "year_published": "1800"},
+            {"id": 2, "author": "Nelle Harper Lee"}
+        ], headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['books'][0]['year_published'], "1800")
+        self.assertEqual(data['books'][1]['author'], "Nelle Harper Lee")
+
+
+    # @app.route("/data/books/batch", methods=["DELETE"])
+    def test_delete_books_batch(self):
+        self.test_create_books_batch()
+        res = self.client().delete('/data/books/batch', json=[1, 2], headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['books'], [1, 2])
+        self.assertEqual(len(json.loads(self.client().get('/data/books').data)['books']), 0)
+
+
     ###################    BOOKS    ###################
     ## Error behavior
 
+    # @app.route("/data/books/batch", methods=["POST"]) atomic batch with an invalid book
+    def test_422_on_create_books_batch(self):
+        new_book = self.book2.copy()
+        del new_book['title']
+        res = self.client().post('/data/books/batch', json=[self.book1, new_book, self.book1], headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual([error['index'] for error in data['errors']], [1, 2])
+        self.assertEqual(len(json.loads(self.client().get('/data/books').data)['books']), 0)
+
+
+    # @app.route("/data/books/batch", methods=["POST"]) partial batch with an invalid book
+    def test_partial_create_books_batch(self):
+        self.test_create_book1()
+        res = self.client().post('/data/books/batch?mode=partial', json=[self.book1, self.book2], headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['errors'], [{"index": 0, "message": "title already exists"}])
+        self.assertEqual(data['books'][0]['title'], self.book2['title'])
+
+
+    # @app.route("/data/books/batch", methods=["DELETE"]) partial batch with a missing id
+    def test_partial_delete_books_batch(self):
+        self.test_create_book1()
+        res = self.client().delete('/data/books/batch?mode=partial', json=[1, 1000], headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['books'], [1])
+        self.assertEqual(data['errors'], [{"index": 1, "message": "not found"}])
+
+
     # @app.route("/data/books", methods=["POST"]) with JWT token but malformed book
     def test_422_on_create_book(self):
         new_book = self.book1.copy()
@@ -135,6 +353,59 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
 
 
+    # @app.route("/data/books", methods=["POST"]) with the isbn or title of another book
+    def test_409_on_create_book(self):
+        self.test_create_book2()
+        res = self.client().post('/data/books', json=dict(self.book1, isbn="0446310786"), headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(data['message'], "a book with this isbn13 already exists")
+
+        res = self.client().post('/data/books', json=dict(self.book2, isbn=None), headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(data['message'], "a book with this title already exists")
+
+
+    # @app.route("/data/books/<int:id>", methods=["PATCH"]) with the isbn of another book
+    def test_409_on_patch_book(self):
+        self.test_create_book1()
+        self.test_create_book2()
+        res = self.client().patch('/data/books/1', json={"isbn": self.book2['isbn']}, headers=active_auth)
+
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(json.loads(res.data)['message'], "a book with this isbn13 already exists")
+        res = self.client().patch('/data/books/1', json={"title": self.book2['title']}, headers=active_auth)
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(json.loads(res.data)['message'], "a book with this title already exists")
+        res = self.client().patch('/data/books/2', json={"isbn": "978-0-446-31078-9"}, headers=active_auth)
+        self.assertEqual(res.status_code, 200)
+
+
+    # @app.route("/data/books/batch", methods=["POST"]) partial batch repeating an isbn
+    def test_partial_create_books_batch_isbn(self):
+        self.test_create_book1()
+        res = self.client().post('/data/books/batch?mode=partial',
+                                 json=[dict(self.book2, isbn=self.book1['isbn']), self.book2], headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['errors'], [{"index": 0, "message": "isbn13 already exists"}])
+        self.assertEqual(len(data['books']), 1)
+
+
+    # @app.route("/data/books/isbn/<isbn>", methods=["GET"])
+    def test_404_on_get_book_by_isbn(self):
+        self.test_create_book1()
+        res = self.client().get('/data/books/isbn/9780446310789')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+
     # @app.route("/data/books/<int:id>", methods=["GET"])
     def test_404_on_get_book(self):
         self.test_create_book1()
@@ -154,6 +425,17 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
     
 
+    # @app.route("/data/books", methods=["GET"])
+    def test_400_on_get_books_bad_params(self):
+        for query in ['limit=0', 'limit=abc', 'cursor=abc', 'fields=title,most_wanted', 'format=xml',
+                      'year=0', 'year=-5', 'year=9999', 'year=10000']:
+            res = self.client().get('/data/books?' + query)
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 400)
+            self.assertEqual(data['success'], False)
+
+
     # @app.route("/data/books", methods=["GET"])
     def test_405_on_get_books(self):
         res = self.client().patch('/data/books')
@@ -172,6 +454,18 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 422)
         self.assertEqual(data['success'], False)
 
+    def test_404_on_patch_missing_book(self):
+        res = self.client().patch('/data/books/1000', json={"year_published": "1800"}, headers=active_auth)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(json.loads(res.data)['success'], False)
+
+    def test_404_on_delete_missing_book(self):
+        res = self.client().delete('/data/books/1000', headers=active_auth)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(json.loads(res.data)['success'], False)
+
 
     # @app.route("/data/books", methods=["GET"])
     def test_404_on_delete_book(self):
@@ -255,6 +549,32 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(len(data['degrees']), 2)
 
     
+    # @app.route("/data/degrees", methods=["GET"]) as ndjson
+    def test_get_degrees_ndjson(self):
+        self.test_create_degree1()
+        self.test_create_degree2()
+        res = self.client().get('/data/degrees?format=ndjson')
+        lines = res.data.decode('utf-8').splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['title'], self.degree1['title'])
+
+
+    # @app.route("/data/degrees/<int:id>", methods=["GET"]) with If-None-Match
+    def test_304_on_get_degree(self):
+        self.test_create_degree1()
+        res = self.client().get('/data/degrees/1')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/data/degrees/1', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+
+        self.client().patch('/data/degrees/1', json={"year_completed": "2000"}, headers=active_auth)
+        res = self.client().get('/data/degrees/1', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+
+    
     # @app.route("/data/degrees/<int:id>", methods=["PATCH"])
     def test_patch_degree(self):
         self.test_create_degree1()
@@ -264,6 +584,14 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['degrees'][0]['year_completed'], "2000")
 
+    # @app.route("/data/degrees/batch", methods=["POST"])
+    def test_create_degrees_batch(self):
+        res = self.client().post('/data/degrees/batch', json=[self.degree1, self.degree2], headers=active_auth)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['degrees']), 2)
+
     # @app.route("/data/degrees/<int:id>", methods=["DELETE"])
     def test_delete_degree(self):
         self.test_create_degree1()
@@ -272,6 +600,23 @@ class BookTestCase(unittest.TestCase):
 
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['id_deleted'], 1)
+
+    def test_patch_degree_statements(self):
+        self.test_create_degree1()
+        with count_statements(self.app) as statements:
+            res = self.client().patch('/data/degrees/1', json={"year_completed": "2000"}, headers=active_auth)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(statements), write_statements(self.app))
+        self.assertTrue(statements[0].startswith('UPDATE degrees'))
+
+    def test_delete_degree_statements(self):
+        self.test_create_degree1()
+        with count_statements(self.app) as statements:
+            res = self.client().delete('/data/degrees/1', headers=active_auth)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(statements), 1)
     
 
     ###################    DEGREES    ###################
@@ -325,6 +670,18 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 422)
         self.assertEqual(data['success'], False)
 
+    def test_404_on_patch_missing_degree(self):
+        res = self.client().patch('/data/degrees/1000', json={"year_completed": "2000"}, headers=active_auth)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(json.loads(res.data)['success'], False)
+
+    def test_404_on_delete_missing_degree(self):
+        res = self.client().delete('/data/degrees/1000', headers=active_auth)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(json.loads(res.data)['success'], False)
+
 
     # @app.route("/data/degrees", methods=["GET"])
     def test_404_on_delete_degree(self):
@@ -346,6 +703,15 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
     
 
+    # @app.route("/data/degrees/batch", methods=["POST"]) without JWT token
+    def test_not_auth_on_create_degrees_batch(self):
+        res = self.client().post('/data/degrees/batch', json=[self.degree1, self.degree2])
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(data['success'], False)
+    
+
     # @app.route("/data/degrees/<int:id>", methods=["PATCH"])
     def test_not_auth_on_patch_degree(self):
         self.test_create_degree1()
@@ -366,6 +732,43 @@ class BookTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
 
 
+
+    ###################    SEARCH    ###################
+
+    # @app.route("/data/search", methods=["GET"]) with prefixes across books and degrees
+    def test_search(self):
+        self.test_create_book1()
+        self.test_create_book2()
+        self.test_create_degree1()
+        res = self.client().get('/data/search?q=harp LE')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([book['title'] for book in data['books']], [self.book2['title']])
+        self.assertEqual(data['degrees'], [])
+
+        data = json.loads(self.client().get('/data/search?q=cloud&type=degrees').data)
+        self.assertEqual([degree['title'] for degree in data['degrees']], [self.degree1['title']])
+        self.assertNotIn('books', data)
+
+
+    # @app.route("/data/search", methods=["GET"]) sees writes made after a first search
+    def test_search_after_write(self):
+        self.test_create_book1()
+        self.assertEqual(json.loads(self.client().get('/data/search?q=mockingbird').data)['books'], [])
+        self.test_create_book2()
+
+        data = json.loads(self.client().get('/data/search?q=mockingbird').data)
+        self.assertEqual([book['title'] for book in data['books']], [self.book2['title']])
+
+
+    # @app.route("/data/search", methods=["GET"]) without q or with a bad type
+    def test_400_on_search(self):
+        self.assertEqual(self.client().get('/data/search').status_code, 400)
+        self.assertEqual(self.client().get('/data/search?q=lee&type=movies').status_code, 400)
+
+
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from assets import build, MANIFEST
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipUnless(Image, 'Pillow is not installed')
+class BuildTestCase(unittest.TestCase):
+    """This class represents the asset build test case"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp_dir.name, 'resources')
+        self.output = os.path.join(self.tmp_dir.name, 'assets')
+        os.makedirs(os.path.join(self.source, 'images'))
+        os.makedirs(os.path.join(self.source, 'favicon'))
+        Image.new('RGB', (800, 400), (200, 30, 30)).save(os.path.join(self.source, 'images', 'photo.jpg'))
+        Image.new('RGBA', (32, 32), (0, 0, 0, 0)).save(os.path.join(self.source, 'favicon', 'icon.png'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_variants_and_manifest(self):
+        manifest = build(self.source, self.output, widths=(200, 400, 1600), formats=('webp',))
+        photo = manifest['images/photo.jpg']
+
+        self.assertEqual((photo['width'], photo['height']), (800, 400))
+        self.assertEqual(sorted(photo['variants']), ['jpeg', 'webp'])
+        self.assertEqual([width for width, _ in photo['variants']['webp']], [200, 400, 800])
+        self.assertRegex(photo['variants']['webp'][0][1], r'^images/photo-200w\.[0-9a-f]{8}\.webp$')
+        self.assertRegex(manifest['favicon/icon.png']['url'], r'^favicon/icon\.[0-9a-f]{8}\.png$')
+        for _, name in photo['variants']['webp'] + photo['variants']['jpeg']:
+            self.assertTrue(os.path.isfile(os.path.join(self.output, name)))
+        with open(os.path.join(self.output, MANIFEST)) as f:
+            self.assertEqual(json.load(f), manifest)
+
+    def test_names_follow_the_content(self):
+        first = build(self.source, self.output, widths=(200,), formats=())
+        again = build(self.source, self.output, widths=(200,), formats=())
+        Image.new('RGB', (800, 400), (30, 30, 200)).save(os.path.join(self.source, 'images', 'photo.jpg'))
+        changed = build(self.source, self.output, widths=(200,), formats=())
+
+        self.assertEqual(again, first)
+        self.assertNotEqual(changed['images/photo.jpg']['url'], first['images/photo.jpg']['url'])
+        self.assertEqual(changed['favicon/icon.png'], first['favicon/icon.png'])
+
+
+class HelpersTestCase(unittest.TestCase):
+    """This class represents the asset template helpers test case"""
+
+    manifest = {
+        'favicon/icon.png': {'url': 'favicon/icon.0123abcd.png'},
+        'images/photo.jpg': {
+            'url': 'images/photo.89abcdef.jpg',
+            'width': 800,
+            'height': 400,
+            'variants': {
+                'webp': [[400, 'images/photo-400w.11111111.webp'], [800, 'images/photo-800w.22222222.webp']],
+                'jpeg': [[400, 'images/photo-400w.33333333.jpg'], [800, 'images/photo-800w.44444444.jpg']]
+            }
+        }
+    }
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp_dir.name, MANIFEST), 'w') as f:
+            json.dump(self.manifest, f)
+        os.makedirs(os.path.join(self.tmp_dir.name, 'favicon'))
+        with open(os.path.join(self.tmp_dir.name, 'favicon', 'icon.0123abcd.png'), 'wb') as f:
+            f.write(b'\x89PNG')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def render(self, app, source):
+        with app.test_request_context():
+            return app.jinja_env.from_string(source).render()
+
+    def test_picture(self):
+        app = create_app({'ASSETS_DIR': self.tmp_dir.name})
+        html = self.render(app, "{{ picture('images/photo.jpg', 'A \"photo\"', width=400) }}")
+
+        self.assertTrue(html.startswith('<picture><source type="image/webp" '
+                                        'srcset="/assets/images/photo-400w.11111111.webp 400w, '
+                                        '/assets/images/photo-800w.22222222.webp 800w" '
+                                        'sizes="(max-width: 400px) 100vw, 400px">'))
+        self.assertIn('src="/assets/images/photo-800w.44444444.jpg"', html)
+        self.assertIn('width="400" height="200" alt="A &#34;photo&#34;" loading="lazy"', html)
+
+    def test_asset_url(self):
+        app = create_app({'ASSETS_DIR': self.tmp_dir.name})
+
+        self.assertEqual(self.render(app, "{{ asset_url('favicon/icon.png') }}"), '/assets/favicon/icon.0123abcd.png')
+
+    def test_without_a_build(self):
+        app = create_app({'ASSETS_DIR': os.path.join(self.tmp_dir.name, 'missing')})
+
+        self.assertEqual(self.render(app, "{{ asset_url('favicon/icon.png') }}"), '/resources/favicon/icon.png')
+        self.assertEqual(self.render(app, "{{ picture('images/photo.jpg', 'photo', width=400) }}"),
+                         '<img src="/resources/images/photo.jpg" width="400" alt="photo">')
+
+    def test_assets_are_immutable(self):
+        res = create_app({'ASSETS_DIR': self.tmp_dir.name}).test_client().get('/assets/favicon/icon.0123abcd.png')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        res.close()
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
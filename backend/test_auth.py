@@ -0,0 +1,151 @@
+import os
+import time
+import tempfile
+import unittest
+
+from auth import AuthError, VerifiedTokenCache, verify_decode_jwt
+from auth_stub import LocalAuth0, LocalSigner, serve_jwks
+from jwks import JWKSKeyStore
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+    """This class represents the JWKS key store test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.signer = LocalSigner()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.jwks_path = os.path.join(self.tmp_dir.name, 'jwks.json')
+        self.jwks_url = self.signer.write_jwks(self.jwks_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_keys_are_fetched_once(self):
+        store = JWKSKeyStore(self.jwks_url)
+        for _ in range(5):
+            self.assertEqual(store.get_key(self.signer.kid)['kid'], self.signer.kid)
+
+        self.assertEqual(store.fetches, 1)
+
+    def test_ttl_zero_fetches_every_time(self):
+        store = JWKSKeyStore(self.jwks_url, ttl=0)
+        for _ in range(3):
+            store.get_key(self.signer.kid)
+
+        self.assertEqual(store.fetches, 3)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        store = JWKSKeyStore(self.jwks_url, min_refetch_interval=60)
+        store.get_key(self.signer.kid)
+        self.assertIsNone(store.get_key('rotated-key'))
+        self.assertIsNone(store.get_key('rotated-key'))
+
+        self.assertEqual(store.fetches, 2)
+
+    def test_last_known_good_keys_survive_failed_fetch(self):
+        store = JWKSKeyStore(self.jwks_url, ttl=1, min_refetch_interval=0)
+        store.get_key(self.signer.kid)
+        store.url = 'file:///does/not/exist.json'
+        store._fetched_at -= 10
+
+        self.assertEqual(store.get_key(self.signer.kid)['kid'], self.signer.kid)
+        self.assertEqual(store.fetch_errors, 1)
+
+    def test_snapshot_is_loaded_when_auth0_is_unreachable(self):
+        snapshot_path = os.path.join(self.tmp_dir.name, 'snapshot.json')
+        JWKSKeyStore(self.jwks_url, snapshot_path=snapshot_path).refresh()
+        store = JWKSKeyStore('file:///does/not/exist.json', snapshot_path=snapshot_path)
+
+        self.assertEqual(store.get_key(self.signer.kid)['kid'], self.signer.kid)
+
+    def test_stub_http_server(self):
+        server, url = serve_jwks(self.signer.jwks())
+        try:
+            store = JWKSKeyStore(url)
+            store.get_key(self.signer.kid)
+            store.get_key(self.signer.kid)
+            self.assertEqual(server.handler.requests_served, 1)
+        finally:
+            server.shutdown()
+
+
+class VerifyDecodeJWTTestCase(unittest.TestCase):
+    """This class represents the token verification test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.auth0 = LocalAuth0()
+        cls.signer = cls.auth0.signer
+        cls.auth0.install()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.auth0.uninstall()
+        cls.auth0.close()
+
+    def test_verify_local_token(self):
+        token = self.signer.token(['post:books'])
+        payload = verify_decode_jwt(token)
+
+        self.assertEqual(payload['permissions'], ['post:books'])
+
+    def test_expired_token(self):
+        token = self.signer.token(['post:books'], expires_in=-60)
+
+        with self.assertRaises(AuthError) as cm:
+            verify_decode_jwt(token)
+        self.assertEqual(cm.exception.error['code'], 'token_expired')
+
+    def test_unknown_key(self):
+        token = LocalSigner(kid='someone-else', bits=1024).token(['post:books'])
+
+        with self.assertRaises(AuthError) as cm:
+            verify_decode_jwt(token)
+        self.assertEqual(cm.exception.status_code, 401)
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified-token cache test case"""
+
+    def test_hit_after_put(self):
+        cache = VerifiedTokenCache()
+        payload = {'exp': time.time() + 60, 'permissions': ['post:books']}
+        self.assertIsNone(cache.get('token'))
+        cache.put('token', payload)
+
+        self.assertIs(cache.get('token'), payload)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_expired_token_is_evicted(self):
+        cache = VerifiedTokenCache()
+        cache.put('token', {'exp': time.time() - 1})
+
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = VerifiedTokenCache(maxsize=2)
+        exp = time.time() + 60
+        cache.put('a', {'exp': exp})
+        cache.put('b', {'exp': exp})
+        cache.get('a')
+        cache.put('c', {'exp': exp})
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_tokens_without_exp_are_not_cached(self):
+        cache = VerifiedTokenCache()
+        cache.put('token', {'permissions': []})
+
+        self.assertIsNone(cache.get('token'))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,222 @@
+import csv
+import multiprocessing
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from flask import Flask, jsonify
+from sqlalchemy import create_engine
+
+import cache
+from app import create_app
+from cache import LocalCache, LocalRedis, RedisCache, TableVersions, conditional, make_cache
+from import_data import import_file
+from models import db, setup_db, Book
+
+
+class BackendTestCase(unittest.TestCase):
+    """This class represents the cache backends test case"""
+
+    def check_backend(self, backend):
+        self.assertIsNone(backend.get('key'))
+        backend.set('key', b'value')
+        self.assertEqual(backend.get('key'), b'value')
+        backend.delete('key')
+        self.assertIsNone(backend.get('key'))
+
+        start = backend.counter('version:books')
+        self.assertEqual(backend.counter('version:books'), start)
+        self.assertEqual(backend.incr('version:books'), start + 1)
+
+    def test_local_cache(self):
+        self.check_backend(LocalCache())
+
+    def test_redis_cache(self):
+        self.check_backend(RedisCache(LocalRedis()))
+
+    def test_local_cache_evicts_least_recently_used(self):
+        backend = LocalCache(maxsize=2)
+        backend.set('a', b'1')
+        backend.set('b', b'2')
+        backend.get('a')
+        backend.set('c', b'3')
+
+        self.assertEqual(backend.get('a'), b'1')
+        self.assertIsNone(backend.get('b'))
+
+    def test_make_cache(self):
+        self.assertIsInstance(make_cache(None), LocalCache)
+        self.assertIsInstance(make_cache('memory://'), RedisCache)
+        with self.assertRaises(ValueError):
+            make_cache('ftp://cache')
+
+    def test_versions_are_shared_through_the_backend(self):
+        backend = RedisCache(LocalRedis())
+        worker1, worker2 = TableVersions(backend), TableVersions(backend)
+        before = worker2.get('books')
+        worker1.bump('books')
+
+        self.assertNotEqual(worker2.get('books'), before)
+
+
+class ConditionalTestCase(unittest.TestCase):
+    """This class represents the @conditional decorator test case"""
+
+    def setUp(self):
+        self.original = (cache.response_cache, cache.table_versions)
+        cache.response_cache = RedisCache(LocalRedis())
+        cache.table_versions = TableVersions(cache.response_cache)
+        self.calls = 0
+
+        app = Flask(__name__)
+
+        @app.route('/items')
+        @conditional('items')
+        def items():
+            self.calls += 1
+            return jsonify({"success": True, "calls": self.calls})
+
+        self.client = app.test_client
+
+    def tearDown(self):
+        cache.response_cache, cache.table_versions = self.original
+
+    def test_repeated_get_is_served_from_cache(self):
+        first = self.client().get('/items')
+        second = self.client().get('/items')
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.mimetype, 'application/json')
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+
+    def test_query_parameters_are_cached_separately(self):
+        self.client().get('/items?page=1')
+        self.client().get('/items?page=2')
+
+        self.assertEqual(self.calls, 2)
+
+    def test_write_invalidates(self):
+        first = self.client().get('/items')
+        cache.table_versions.bump('items')
+        second = self.client().get('/items', headers={"If-None-Match": first.headers['ETag']})
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(self.calls, 2)
+
+    def test_304_skips_the_view(self):
+        first = self.client().get('/items')
+        second = self.client().get('/items', headers={"If-None-Match": first.headers['ETag']})
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(self.calls, 1)
+
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'needs fork')
+class WorkersTestCase(unittest.TestCase):
+    """This class represents the versions shared between worker processes test case"""
+
+    def setUp(self):
+        self.original = (cache.response_cache, cache.table_versions)
+        # the default setup: a per-process cache, as each gunicorn worker has
+        cache.response_cache = LocalCache()
+        cache.table_versions = TableVersions(cache.response_cache)
+        self.app = create_app()
+        self.client = self.app.test_client
+        self.db_full_path = os.environ.get('DATABASE_URL_TEST')
+        setup_db(self.app, self.db_full_path)
+
+    def tearDown(self):
+        cache.response_cache, cache.table_versions = self.original
+
+    def in_other_process(self, write):
+        def run():
+            # a fresh engine, the parent's connections stay with the parent
+            with self.app.app_context():
+                db.engine.dispose()
+            write()
+
+        process = multiprocessing.get_context('fork').Process(target=run)
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+
+    def titles(self, res):
+        return self.titles_of(res.get_json())
+
+    def titles_of(self, data):
+        return [book['title'] for book in data['books']]
+
+    def test_write_in_another_worker_is_seen(self):
+        first = self.client().get('/data/books')
+        self.assertEqual(self.titles(first), [])
+
+        def write():
+            with self.app.app_context():
+                Book(title='No Filter', author='Sarah Frier', date_read=date(2020, 5, 1)).insert()
+
+        self.in_other_process(write)
+        res = self.client().get('/data/books', headers={"If-None-Match": first.headers['ETag']})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.titles(res), ['No Filter'])
+        self.assertEqual(res.get_json()['total_books'], 1)
+
+    def test_counts_follow_writes_of_other_workers(self):
+        # a shared backend, the count of another worker must not outlive its version
+        cache.response_cache = RedisCache(LocalRedis())
+        cache.table_versions = TableVersions(cache.response_cache, cache.table_versions.store)
+        self.assertEqual(self.client().get('/data/books?year=2020').get_json()['total_books'], 0)
+
+        def write():
+            with self.app.app_context():
+                Book(title='No Filter', author='Sarah Frier', date_read=date(2020, 5, 1)).insert()
+
+        self.in_other_process(write)
+        data = self.client().get('/data/books?year=2020').get_json()
+
+        self.assertEqual(self.titles_of(data), ['No Filter'])
+        self.assertEqual(data['total_books'], 1)
+
+    def test_etags_are_shared_between_workers(self):
+        etag = self.client().get('/data/books').headers['ETag']
+
+        def revalidate():
+            # a worker started afresh, with an empty cache
+            cache.response_cache = LocalCache()
+            cache.table_versions = TableVersions(cache.response_cache, cache.table_versions.store)
+            res = self.client().get('/data/books', headers={"If-None-Match": etag})
+            assert res.status_code == 304, res.status_code
+
+        self.in_other_process(revalidate)
+
+        def write():
+            with self.app.app_context():
+                Book(title='No Filter', author='Sarah Frier', date_read=date(2020, 5, 1)).insert()
+
+        self.in_other_process(write)
+        res = self.client().get('/data/books', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_import_is_seen(self):
+        first = self.client().get('/data/books')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'books.csv')
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['', 'title', 'author', 'isbn', 'year_published',
+                                                       'year_read', 'month_day_read'])
+                writer.writeheader()
+                writer.writerow({'': '0', 'title': 'No Filter', 'author': 'Sarah Frier', 'isbn': '9781982126803',
+                                 'year_published': '2020', 'year_read': '2020', 'month_day_read': '05-01'})
+            self.in_other_process(lambda: import_file(create_engine(self.db_full_path), 'books', path))
+
+        res = self.client().get('/data/books', headers={"If-None-Match": first.headers['ETag']})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.titles(res), ['No Filter'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import gzip
+import unittest
+import zlib
+
+from flask import Flask, jsonify, stream_with_context
+
+import cache
+import compression
+from cache import LocalRedis, RedisCache, TableVersions, conditional
+from compression import init_compression, compress_stream
+
+
+class CompressionTestCase(unittest.TestCase):
+    """This class represents the response compression test case"""
+
+    items = [{"id": i, "title": "Book %d" % i, "author": "Harper Lee"} for i in range(200)]
+
+    def setUp(self):
+        self.original = (cache.response_cache, cache.table_versions)
+        cache.response_cache = RedisCache(LocalRedis())
+        cache.table_versions = TableVersions(cache.response_cache)
+        self.client = self.make_app({}).test_client
+
+    def tearDown(self):
+        cache.response_cache, cache.table_versions = self.original
+
+    def make_app(self, config):
+        app = Flask(__name__)
+        app.config.update(config)
+        init_compression(app)
+
+        @app.route('/items')
+        @conditional('items')
+        def items():
+            return jsonify({"success": True, "items": self.items})
+
+        @app.route('/small')
+        def small():
+            return jsonify({"success": True})
+
+        @app.route('/stream')
+        def stream():
+            def generate():
+                for item in self.items:
+                    yield '{"id": %d}\n' % item['id']
+            return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        @app.route('/items.ndjson')
+        @conditional('items')
+        def items_stream():
+            return stream()
+
+        return app
+
+    def test_gzip(self):
+        plain = self.client().get('/items')
+        res = self.client().get('/items', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+        self.assertEqual(gzip.decompress(res.data), plain.data)
+        self.assertLess(len(res.data), len(plain.data) / 4)
+
+    def test_identity_and_small_bodies_are_left_alone(self):
+        self.assertNotIn('Content-Encoding', self.client().get('/items').headers)
+        res = self.client().get('/small', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(res.json, {"success": True})
+
+    @unittest.skipUnless(compression.zstandard and compression.brotli, 'zstandard or brotli is not installed')
+    def test_preference_and_quality(self):
+        res = self.client().get('/items', headers={'Accept-Encoding': 'gzip, br, zstd'})
+        self.assertEqual(res.headers['Content-Encoding'], 'zstd')
+        self.assertEqual(compression.zstandard.ZstdDecompressor().decompress(res.data),
+                         self.client().get('/items').data)
+
+        res = self.client().get('/items', headers={'Accept-Encoding': 'gzip, br, zstd;q=0.5'})
+        self.assertEqual(res.headers['Content-Encoding'], 'br')
+
+    def test_configured_encodings_and_levels(self):
+        client = self.make_app({'COMPRESS_ENCODINGS': 'gzip', 'COMPRESS_LEVELS': {'gzip': 1}}).test_client
+        res = client().get('/items', headers={'Accept-Encoding': 'zstd, br, gzip'})
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(res.data, compression.compress(client().get('/items').data, 'gzip', 1))
+
+        with self.assertRaises(ValueError):
+            self.make_app({'COMPRESS_ENCODINGS': 'lzma'})
+
+    def test_compressed_bytes_are_cached(self):
+        compress, calls = compression.compress, []
+        compression.compress = lambda *args: calls.append(args) or compress(*args)
+        try:
+            first = self.client().get('/items', headers={'Accept-Encoding': 'gzip'})
+            second = self.client().get('/items', headers={'Accept-Encoding': 'gzip'})
+        finally:
+            compression.compress = compress
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(second.data, first.data)
+
+    def test_etag_is_weakened_and_still_matches(self):
+        res = self.client().get('/items', headers={'Accept-Encoding': 'gzip'})
+        etag = res.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        res = self.client().get('/items', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+
+    def test_stream_etag_is_weakened_and_still_matches(self):
+        plain = self.client().get('/items.ndjson')
+        res = self.client().get('/items.ndjson', headers={'Accept-Encoding': 'gzip'})
+        etag = res.headers['ETag']
+
+        self.assertFalse(plain.headers['ETag'].startswith('W/'))
+        self.assertEqual(etag, 'W/' + plain.headers['ETag'])
+        self.assertEqual(gzip.decompress(res.data), plain.data)
+        res = self.client().get('/items.ndjson', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+
+    def test_stream(self):
+        plain = self.client().get('/stream')
+        res = self.client().get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.data), plain.data)
+
+    def test_stream_chunks_are_flushed(self):
+        chunks = compress_stream(iter(['{"id": 1}\n', '{"id": 2}\n']), 'gzip', 6, 'utf-8')
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        self.assertEqual(decompressor.decompress(next(chunks)), b'{"id": 1}\n')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import csv
+import tempfile
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine
+
+from import_data import import_file, import_incremental
+from models import db, Book, Degree, ImportState
+
+
+class ImportTestCase(unittest.TestCase):
+    """This class represents the csv importer test case"""
+
+    books = [
+        {'': '0', 'title': 'No Filter', 'author': 'Sarah Frier', 'isbn': '9781982126803',
+         'year_published': '2020.0', 'year_read': '2020', 'month_day_read': '05-01'},
+        {'': '1', 'title': 'To Kill a Mockingbird', 'author': 'Harper Lee', 'isbn': '9780446310789',
+         'year_published': '1960', 'year_read': '2020', 'month_day_read': '06-01'},
+    ]
+    degrees = [
+        {'': '0', 'institution': 'Udacity', 'title': 'Cloud Developer', 'category': 'Course',
+         'year_completed': '2020', 'location': 'Online', 'url': ''},
+    ]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine('sqlite:///' + os.path.join(self.tmp_dir.name, 'import_test.db'))
+        db.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def write_csv(self, name, rows):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def table(self, model):
+        table = model.__table__
+        return [dict(row) for row in self.engine.execute(table.select().order_by(*table.primary_key.columns))]
+
+    def test_import(self):
+        stats = import_file(self.engine, 'books', self.write_csv('books.csv', self.books))
+        import_file(self.engine, 'degrees', self.write_csv('degrees.csv', self.degrees))
+
+        self.assertEqual((stats.read, stats.inserted, stats.skipped), (2, 2, 0))
+        books = self.table(Book)
+        self.assertEqual(books[0]['date_read'], date(2020, 5, 1))
+        self.assertEqual(books[0]['year_published'], '2020')
+        self.assertIsNone(self.table(Degree)[0]['url'])
+
+    def test_rerun_writes_nothing(self):
+        path = self.write_csv('books.csv', self.books)
+        import_file(self.engine, 'books', path)
+        stats = import_file(self.engine, 'books', path)
+
+        self.assertEqual((stats.inserted, stats.updated, stats.unchanged), (0, 0, 2))
+        self.assertEqual(len(self.table(Book)), 2)
+
+    def test_changed_rows_are_updated_by_isbn(self):
+        import_file(self.engine, 'books', self.write_csv('books.csv', self.books))
+        renamed = [dict(self.books[0], title='No Filter (paperback)'), self.books[1]]
+        stats = import_file(self.engine, 'books', self.write_csv('renamed.csv', renamed))
+
+        self.assertEqual((stats.inserted, stats.updated, stats.unchanged), (0, 1, 1))
+        self.assertEqual([book['title'] for book in self.table(Book)],
+                         ['No Filter (paperback)', 'To Kill a Mockingbird'])
+
+    def test_isbn10_matches_the_isbn13(self):
+        import_file(self.engine, 'books', self.write_csv('books.csv', self.books))
+        isbn10 = [dict(self.books[1], isbn='0446310786', author='Nelle Harper Lee')]
+        stats = import_file(self.engine, 'books', self.write_csv('isbn10.csv', isbn10))
+
+        self.assertEqual((stats.inserted, stats.updated), (0, 1))
+        self.assertEqual([book['isbn13'] for book in self.table(Book)], ['9781982126803', '9780446310789'])
+
+    def test_invalid_and_repeated_rows_are_skipped(self):
+        rows = self.books + [dict(self.books[0], title='Same isbn'),
+                             dict(self.books[1], isbn='1', title='Undated', month_day_read='13-45')]
+        stats = import_file(self.engine, 'books', self.write_csv('books.csv', rows), chunk_size=10)
+
+        self.assertEqual((stats.inserted, stats.skipped), (2, 2))
+        self.assertCountEqual(stats.errors, ['line 4: repeats a row earlier in the file',
+                                             'line 5: date_read must be a YYYY-MM-DD date'])
+
+    def test_chunks(self):
+        rows = [dict(self.books[0], isbn=str(i), title='Book %d' % i) for i in range(25)]
+        stats = import_file(self.engine, 'books', self.write_csv('books.csv', rows), chunk_size=10)
+
+        self.assertEqual(stats.inserted, 25)
+        self.assertEqual(len(self.table(Book)), 25)
+
+
+class IncrementalImportTestCase(ImportTestCase):
+    """This class represents the incremental import test case"""
+
+    def test_first_run_loads_everything(self):
+        stats = import_incremental(self.engine, 'books', self.write_csv('books.csv', self.books))
+
+        self.assertEqual((stats.inserted, stats.unchanged), (2, 0))
+        self.assertEqual(len(self.table(ImportState)), 3)
+
+    def test_unchanged_file_is_skipped(self):
+        path = self.write_csv('books.csv', self.books)
+        import_incremental(self.engine, 'books', path)
+        stats = import_incremental(self.engine, 'books', path)
+
+        self.assertEqual((stats.read, stats.written), (0, 0))
+
+    def test_only_changes_are_written(self):
+        import_incremental(self.engine, 'books', self.write_csv('books.csv', self.books))
+        added = dict(self.books[0], isbn='9780143127550', title='Added later')
+        changed = dict(self.books[1], author='Nelle Harper Lee')
+        stats = import_incremental(self.engine, 'books', self.write_csv('books.csv', [changed, added]))
+
+        self.assertEqual((stats.inserted, stats.updated, stats.deleted, stats.unchanged), (1, 1, 1, 0))
+        self.assertEqual([(book['title'], book['author']) for book in self.table(Book)],
+                         [('To Kill a Mockingbird', 'Nelle Harper Lee'), ('Added later', 'Sarah Frier')])
+
+    def test_changed_key_keeps_the_row(self):
+        no_isbn = [dict(self.books[0], isbn='')]
+        import_incremental(self.engine, 'books', self.write_csv('books.csv', no_isbn))
+        stats = import_incremental(self.engine, 'books', self.write_csv('books.csv', self.books[:1]))
+
+        self.assertEqual((stats.updated, stats.deleted), (1, 0))
+        self.assertEqual([book['isbn'] for book in self.table(Book)], ['9781982126803'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
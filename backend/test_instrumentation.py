@@ -0,0 +1,101 @@
+import os
+import unittest
+
+import auth
+from app import create_app
+from auth_stub import LocalAuth0
+from instrumentation import Histogram, Metrics, metrics
+from models import setup_db
+
+
+class HistogramTestCase(unittest.TestCase):
+    """This class represents the metrics aggregation test case"""
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 7):
+            histogram.observe(value)
+
+        self.assertEqual(list(histogram.cumulative()), [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual(histogram.sum, 11.5)
+
+    def test_render(self):
+        registry = Metrics()
+        registry.observe('GET', '/data/books/<int:id>', 200, {'request_sql_statements': 2})
+        text = registry.render()
+
+        self.assertIn('life_data_requests_total{method="GET",endpoint="/data/books/<int:id>",status="200"} 1', text)
+        self.assertIn('life_data_request_sql_statements_bucket{method="GET",endpoint="/data/books/<int:id>",le="2"} 1', text)
+        self.assertIn('# TYPE life_data_request_duration_seconds histogram', text)
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    """This class represents the instrumented app test case"""
+
+    degree = {
+        "category": "Course",
+        "institution": "Udacity",
+        "location": "Online",
+        "title": "Instrumented degree",
+        "url": None,
+        "year_completed": "2020"
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.auth0 = LocalAuth0()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.auth0.close()
+
+    def setUp(self):
+        self.auth0.install()
+        auth.token_cache.clear()
+        metrics.clear()
+        self.app = create_app({'METRICS_ENABLED': True})
+        self.client = self.app.test_client
+        setup_db(self.app, os.environ.get('DATABASE_URL_TEST'))
+
+    def tearDown(self):
+        self.auth0.uninstall()
+        auth.token_cache.clear()
+
+    def test_server_timing_counts_queries(self):
+        res = self.client().get('/data/degrees')
+        timing = res.headers['Server-Timing']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('app;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[0-9.]+;desc="[1-9][0-9]* queries"')
+
+    def test_auth_time_is_recorded(self):
+        res = self.client().post('/data/degrees', json=self.degree,
+                                 headers=self.auth0.headers(['post:degrees']))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertRegex(res.headers['Server-Timing'], r'auth;dur=(?!0\.00)[0-9.]+')
+
+    def test_metrics_endpoint(self):
+        self.client().get('/data/degrees')
+        self.client().get('/data/degrees?format=ndjson').get_data()
+        res = self.client().get('/metrics')
+        text = res.get_data(as_text=True)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.content_type.startswith('text/plain'))
+        self.assertIn('life_data_requests_total{method="GET",endpoint="/data/degrees",status="200"} 2', text)
+        self.assertIn('life_data_response_bytes_count{method="GET",endpoint="/data/degrees"} 2', text)
+        self.assertNotIn('endpoint="/metrics"', text)
+
+    def test_disabled_by_default(self):
+        app = create_app()
+        res = app.test_client().get('/metrics')
+
+        self.assertEqual(res.status_code, 404)
+        self.assertNotIn('Server-Timing', res.headers)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import unittest
+from datetime import date
+
+from flask import Flask, jsonify
+from flask.json import JSONEncoder
+
+import json_provider
+from json_provider import FastJSONEncoder, configure_json
+
+
+class FastJSONEncoderTestCase(unittest.TestCase):
+    """This class represents the JSON encoder test case"""
+
+    payload = {
+        "success": True,
+        "total_books": 1,
+        "books": [{"id": 1, "title": "El año que vivimos en peligro", "date_read": date(2019, 1, 1)}]
+    }
+
+    def render(self, app):
+        with app.test_request_context():
+            return jsonify(self.payload).get_data()
+
+    def test_matches_flask_encoder(self):
+        fast, default = Flask(__name__), Flask(__name__)
+        configure_json(fast)
+        configure_json(default, JSONEncoder)
+
+        self.assertTrue(issubclass(fast.json_encoder, FastJSONEncoder))
+        self.assertEqual(json.loads(self.render(fast)), json.loads(self.render(default)))
+
+    def test_falls_back_to_stdlib(self):
+        original = json_provider.orjson
+        json_provider.orjson = None
+        try:
+            app = Flask(__name__)
+            configure_json(app)
+            self.assertEqual(json.loads(self.render(app))['books'][0]['date_read'],
+                             'Tue, 01 Jan 2019 00:00:00 GMT')
+        finally:
+            json_provider.orjson = original
+
+    def test_compact_in_production(self):
+        app = Flask(__name__)
+        app.env = 'production'
+        app.debug = True
+        configure_json(app)
+
+        self.assertNotIn(b'\n ', self.render(app))
+
+    def test_pretty_in_development(self):
+        app = Flask(__name__)
+        app.env = 'development'
+        app.debug = True
+        configure_json(app)
+
+        self.assertIn(b'\n ', self.render(app))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
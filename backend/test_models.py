@@ -0,0 +1,127 @@
+import os
+import threading
+import unittest
+from datetime import date
+
+from app import create_app
+from models import db, setup_db, engine_options, normalize_isbn, Book, TableVersion
+
+
+class EngineOptionsTestCase(unittest.TestCase):
+    """This class represents the engine options test case"""
+
+    def test_defaults_follow_the_worker_class(self):
+        sync = engine_options('postgresql://localhost/life_data', {})
+        gthread = engine_options('postgresql://localhost/life_data',
+                                 {'WORKER_CLASS': 'gthread', 'WORKER_THREADS': '8'})
+
+        self.assertEqual((sync['pool_size'], sync['max_overflow']), (2, 2))
+        self.assertEqual((gthread['pool_size'], gthread['max_overflow']), (8, 8))
+        self.assertTrue(sync['pool_pre_ping'])
+        self.assertEqual(sync['connect_args'], {'options': '-c statement_timeout=30000'})
+
+    def test_environment_overrides(self):
+        options = engine_options('postgresql://localhost/life_data', {
+            'DB_POOL_SIZE': '5',
+            'DB_MAX_OVERFLOW': '0',
+            'DB_POOL_RECYCLE': '300',
+            'DB_POOL_PRE_PING': '0',
+            'DB_STATEMENT_TIMEOUT_MS': '0'
+        })
+
+        self.assertEqual((options['pool_size'], options['max_overflow'], options['pool_recycle']), (5, 0, 300))
+        self.assertFalse(options['pool_pre_ping'])
+        self.assertNotIn('connect_args', options)
+
+    def test_in_memory_sqlite_is_left_alone(self):
+        self.assertEqual(engine_options('sqlite://', {}), {})
+
+
+class NormalizeIsbnTestCase(unittest.TestCase):
+    """This class represents the isbn normalization test case"""
+
+    def test_isbn10_and_isbn13_agree(self):
+        for isbn in ('9780446310789', '978-0-446-31078-9', '0446310786', '0-446-31078-6', '446310786'):
+            self.assertEqual(normalize_isbn(isbn), '9780446310789')
+        self.assertEqual(normalize_isbn('080442957x'), '9780804429573')
+
+    def test_invalid_isbns(self):
+        for isbn in (None, '', '0', '1', '9780446310788', '0446310787', '1234567890123'):
+            self.assertIsNone(normalize_isbn(isbn))
+
+
+class PoolTestCase(unittest.TestCase):
+    """This class represents the connection pool test case"""
+
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+            os.environ.get('DATABASE_URL_TEST'), {'DB_POOL_SIZE': '2', 'DB_MAX_OVERFLOW': '2'})
+        self.client = self.app.test_client
+        setup_db(self.app, os.environ.get('DATABASE_URL_TEST'))
+
+    def test_concurrent_requests_reuse_connections(self):
+        errors = []
+
+        def worker(n):
+            client = self.client()
+            for i in range(10):
+                # a different year per request, so none is served from the response cache
+                res = client.get('/data/books?year=%d' % (1900 + n * 10 + i))
+                if res.status_code != 200:
+                    errors.append(res.status_code)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = self.client().get('/status/db-pool').get_json()['db_pool']
+        self.assertEqual(errors, [])
+        self.assertEqual(stats['pool'], 'QueuePool')
+        self.assertLessEqual(stats['connects'], 4)
+        self.assertGreaterEqual(stats['checkouts'], 40)
+        self.assertEqual(stats['checkedout'], 0)
+
+
+class TableVersionTestCase(unittest.TestCase):
+    """This class represents the table versions test case"""
+
+    def setUp(self):
+        self.app = create_app()
+        setup_db(self.app, os.environ.get('DATABASE_URL_TEST'))
+        self.context = self.app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def versions(self):
+        return {name: version for name, (version, _) in TableVersion.load(('books', 'degrees')).items()}
+
+    def test_writes_bump_their_table(self):
+        before = self.versions()
+        book = Book(title='No Filter', author='Sarah Frier', date_read=date(2020, 5, 1))
+        book.insert()
+        inserted = self.versions()
+        db.session.execute(Book.__table__.update().values(author='Sarah F.'))
+        db.session.execute(Book.__table__.delete())
+        db.session.commit()
+
+        self.assertGreater(inserted['books'], before['books'])
+        self.assertGreater(self.versions()['books'], inserted['books'])
+        self.assertEqual(self.versions()['degrees'], before['degrees'])
+
+    def test_missing_rows_are_created(self):
+        db.session.execute(TableVersion.__table__.delete())
+        db.session.commit()
+
+        self.assertEqual(sorted(self.versions()), ['books', 'degrees'])
+        self.assertEqual(self.versions(), self.versions())
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import gzip
+import os
+import unittest
+from datetime import date
+
+from flask import render_template
+from sqlalchemy import event
+
+from app import create_app
+from models import db, setup_db, Book, Degree
+import pages
+
+
+class PagesTestCase(unittest.TestCase):
+    """This class represents the pre-rendered pages test case"""
+
+    def setUp(self):
+        self.app = create_app({'PAGE_MAX_AGE': 600})
+        self.client = self.app.test_client
+
+    def template(self, name):
+        with self.app.test_request_context():
+            return render_template(name).encode('utf-8')
+
+    def test_gzip(self):
+        res = self.client().get('/projects', headers={'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(res.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(res.headers['Cache-Control'], 'public, max-age=600')
+        self.assertEqual(gzip.decompress(res.data), self.template('projects.html'))
+
+    def test_identity_without_accept_encoding(self):
+        res = self.client().get('/projects')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(res.data, self.template('projects.html'))
+
+    def test_refused_encodings_are_not_sent(self):
+        res = self.client().get('/', headers={'Accept-Encoding': 'br;q=0, gzip;q=0'})
+
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(res.data, self.template('index.html'))
+
+    @unittest.skipUnless(pages.brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        res = self.client().get('/', headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(res.headers['Content-Encoding'], 'br')
+        self.assertEqual(pages.brotli.decompress(res.data), self.template('index.html'))
+
+    def test_304_per_variant(self):
+        gzipped = self.client().get('/', headers={'Accept-Encoding': 'gzip'})
+        plain = self.client().get('/')
+        self.assertNotEqual(gzipped.headers['ETag'], plain.headers['ETag'])
+
+        res = self.client().get('/', headers={'Accept-Encoding': 'gzip',
+                                              'If-None-Match': gzipped.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+        res = self.client().get('/', headers={'If-None-Match': gzipped.headers['ETag']})
+        self.assertEqual(res.status_code, 200)
+
+    def test_etags_survive_a_restart(self):
+        first = self.client().get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        again = create_app().test_client().get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+        self.assertEqual(first, again)
+
+
+class DataPagesTestCase(unittest.TestCase):
+    """This class represents the pages built from the database test case"""
+
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client
+        setup_db(self.app, os.environ.get('DATABASE_URL_TEST'))
+        self.calls = self.count_builds(self.app, 'degrees')
+
+    def count_builds(self, app, name):
+        page, calls = app.extensions['data_pages'][name], []
+        context = page.context
+        page.context = lambda: calls.append(1) or context()
+        return calls
+
+    def add_degree(self, title, category, year):
+        with self.app.app_context():
+            Degree(institution='Udacity', title=title, category=category, year_completed=year,
+                   location='Online', url='https://example.com/' + title).insert()
+
+    def test_degrees_by_category(self):
+        self.add_degree('Cloud Developer', 'Course', '2020')
+        self.add_degree('Energy Engineering', 'MS', '2018')
+        html = self.client().get('/degrees').data.decode('utf-8')
+
+        self.assertLess(html.index('<h3>Course</h3>'), html.index('Cloud Developer'))
+        self.assertLess(html.index('Cloud Developer'), html.index('<h3>MS</h3>'))
+        self.assertIn('href="https://example.com/Energy Engineering"', html)
+
+    def test_rebuilt_only_after_a_write(self):
+        self.add_degree('Cloud Developer', 'Course', '2020')
+        first = self.client().get('/degrees')
+        second = self.client().get('/degrees', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(first.headers['Cache-Control'], 'public, no-cache')
+        self.assertEqual(len(self.calls), 1)
+
+        self.add_degree('React', 'Course', '2020')
+        third = self.client().get('/degrees', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(third.status_code, 200)
+        self.assertIn(b'React', third.data)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_unchanged_view_only_reads_the_version(self):
+        self.add_degree('Cloud Developer', 'Course', '2020')
+        self.client().get('/degrees')
+        with self.app.app_context():
+            engine = db.engine
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self.client().get('/degrees')
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(len(statements), 1)
+        self.assertIn('FROM table_versions', statements[0])
+
+    def test_fragment_is_shared_between_workers(self):
+        self.add_degree('Cloud Developer', 'Course', '2020')
+        self.client().get('/degrees')
+        # a second worker, its page can only come from the cached fragment
+        other = create_app()
+        other.config.update(SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL_TEST'),
+                            SQLALCHEMY_TRACK_MODIFICATIONS=False)
+        db.init_app(other)
+        calls = self.count_builds(other, 'degrees')
+        res = other.test_client().get('/degrees')
+
+        self.assertIn(b'Cloud Developer', res.data)
+        self.assertEqual(calls, [])
+
+    def test_reading_by_year(self):
+        with self.app.app_context():
+            for title, read in (('Sapiens', date(2019, 3, 1)), ('No Filter', date(2020, 5, 1)),
+                                ('Homo Deus', date(2019, 7, 1))):
+                Book(title=title, author='Yuval Noah Harari', date_read=read).insert()
+        html = self.client().get('/reading').data.decode('utf-8')
+
+        self.assertLess(html.index('2020 &middot; 1 book<'), html.index('No Filter'))
+        self.assertLess(html.index('No Filter'), html.index('2019 &middot; 2 books'))
+        self.assertLess(html.index('Homo Deus'), html.index('Sapiens'))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from auth_stub import LocalAuth0
+from models import setup_db, db, Book, REPLICA
+
+
+class ReplicaTestCase(unittest.TestCase):
+    """This class represents the read-replica routing test case"""
+
+    replica_book = {
+        "title": "Only on the replica",
+        "author": "Replica Author",
+        "isbn": "9780000000001",
+        "year_published": "2001",
+        "date_read": "2001-01-01"
+    }
+    new_book = {
+        "title": "Written to the primary",
+        "author": "Primary Author",
+        "isbn": "9780000000002",
+        "year_published": "2002",
+        "date_read": "2002-02-02"
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.auth0 = LocalAuth0()
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.auth0.close()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        self.auth0.install()
+        self.auth = self.auth0.headers(['post:books'])
+
+        replica_path = 'sqlite:///' + os.path.join(self.tmp_dir.name, 'replica_test.db')
+        self.app = create_app({'REPLICA_LAG_SECONDS': 0})
+        self.client = self.app.test_client
+        setup_db(self.app, os.environ.get('DATABASE_URL_TEST'), replica_path)
+        with self.app.app_context():
+            replica = db.get_engine(self.app, bind=REPLICA)
+            db.metadata.drop_all(replica)
+            db.metadata.create_all(replica)
+            replica.execute(Book.__table__.insert(), {
+                **self.replica_book, 'date_read': Book.properties['date_read']('date_read', '2001-01-01')})
+
+    def tearDown(self):
+        self.auth0.uninstall()
+
+    def titles(self, res):
+        self.assertEqual(res.status_code, 200)
+        return [book['title'] for book in res.get_json()['books']]
+
+    def test_public_reads_use_the_replica(self):
+        self.assertEqual(self.titles(self.client().get('/data/books')), [self.replica_book['title']])
+
+    def test_writes_go_to_the_primary(self):
+        res = self.client().post('/data/books', json=self.new_book, headers=self.auth)
+
+        self.assertEqual(res.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual([book.title for book in Book.query.all()], [self.new_book['title']])
+
+    def test_writer_reads_its_own_writes(self):
+        client = self.client()
+        res = client.post('/data/books', json=self.new_book, headers=self.auth)
+        self.assertIn('read_primary_until=', res.headers['Set-Cookie'])
+
+        self.assertEqual(self.titles(client.get('/data/books')), [self.new_book['title']])
+        # a client without the cookie still reads the replica
+        self.assertEqual(self.titles(self.client().get('/data/books?limit=10')), [self.replica_book['title']])
+
+    def test_recently_written_tables_read_the_primary(self):
+        self.app.config['REPLICA_LAG_SECONDS'] = 60
+        Book.touch()
+
+        self.assertEqual(self.titles(self.client().get('/data/books')), [])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from search import InvertedIndex, words
+
+COLUMNS = [('title', 'A'), ('author', 'B'), ('isbn', 'C')]
+
+
+class InvertedIndexTestCase(unittest.TestCase):
+    """This class represents the in-process search index test case"""
+
+    def setUp(self):
+        self.index = InvertedIndex([
+            (1, 'To Kill a Mockingbird', 'Harper Lee', '9780446310789'),
+            (2, 'Go Set a Watchman', 'Harper Lee', '9780062409850'),
+            (3, 'Harper and the Lee Shore', 'Someone Else', None),
+        ], COLUMNS)
+
+    def test_words(self):
+        self.assertEqual(words('No Filter: The Inside-Story'), ['no', 'filter', 'the', 'inside', 'story'])
+
+    def test_every_word_must_match_as_a_prefix(self):
+        self.assertEqual([id for _, id in self.index.search(['harp', 'lee'], 10)], [3, 1, 2])
+        self.assertEqual(self.index.search(['harp', 'watch'], 10), [(0.2 + 0.5, 2)])
+        self.assertEqual(self.index.search(['tolkien'], 10), [])
+
+    def test_title_ranks_above_author_and_whole_words_above_prefixes(self):
+        self.assertEqual(self.index.search(['harper'], 10)[0], (1.0, 3))
+        self.assertEqual(self.index.search(['mocking'], 10), [(0.5, 1)])
+        self.assertEqual(self.index.search(['978044'], 10), [(0.1, 1)])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search(['harper'], 2)), 2)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
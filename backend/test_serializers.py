@@ -0,0 +1,42 @@
+import unittest
+from datetime import date
+
+from models import Book, Degree
+from serializers import book_serializer, degree_serializer, month_year
+
+
+class SerializerTestCase(unittest.TestCase):
+    """This class represents the column-only serializer test case"""
+
+    book = Book(id=1, isbn="9780446310789", title="To Kill a Mockingbird", author="Harper Lee",
+                year_published="1960", date_read=date(2020, 6, 1))
+    degree = Degree(id=1, institution="Udacity", title="Cloud Developer", category="Course",
+                    year_completed="2020", location="Online", url=None)
+
+    def test_month_year_matches_strftime(self):
+        for month in range(1, 13):
+            for year in (1999, 2020):
+                value = date(year, month, 28)
+                self.assertEqual(month_year(value), value.strftime('%b %Y'))
+
+    def test_book_row_matches_long(self):
+        row = tuple(getattr(self.book, field) for field in Book.long_fields)
+
+        self.assertEqual(book_serializer().one(row), self.book.long())
+
+    def test_degree_row_matches_long(self):
+        row = tuple(getattr(self.degree, field) for field in Degree.long_fields)
+
+        self.assertEqual(degree_serializer().one(row), self.degree.long())
+
+    def test_fields_and_extra_columns(self):
+        serializer = book_serializer(['title', 'date_read'], extra=('id', 'date_read'))
+        row = ("To Kill a Mockingbird", date(2020, 6, 1), 1)
+
+        self.assertEqual([column.key for column in serializer.columns], ['title', 'date_read', 'id'])
+        self.assertEqual(serializer.one(row), {"title": "To Kill a Mockingbird", "date_read": "Jun 2020"})
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()